@@ -0,0 +1,33 @@
+"""add_items_search_trigram_index
+
+Revision ID: 5c1e7a9d2b34
+Revises: d0ca57e849ab
+Create Date: 2026-10-14 09:00:00.000000+00:00
+
+The indexed expression must stay identical to _SEARCH_DOCUMENT in
+src/services/inventory_service.py, otherwise the planner cannot use the
+index for item search.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7a9d2b34'
+down_revision = 'd0ca57e849ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("""
+        CREATE INDEX ix_items_search_trgm ON items
+        USING gin ((name || ' ' || sku || ' ' || coalesce(description, '')) gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    op.execute("DROP INDEX IF EXISTS ix_items_search_trgm")
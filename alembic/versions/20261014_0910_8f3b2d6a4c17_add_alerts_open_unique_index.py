@@ -0,0 +1,94 @@
+"""Add partial unique index for open alerts
+
+Migration 001 created alerts with a free-form ``type`` string; the model
+(and the ON CONFLICT insert in InventoryService) uses an ``alert_type``
+enum plus ``title``, ``is_resolved`` and ``is_active``. Those columns are
+brought in line with the model before the index is built on alert_type.
+
+Revision ID: 8f3b2d6a4c17
+Revises: 5c1e7a9d2b34
+Create Date: 2026-10-14 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3b2d6a4c17'
+down_revision = '5c1e7a9d2b34'
+branch_labels = None
+depends_on = None
+
+# Enum labels are stored by member name
+ALERT_TYPES = ('LOW_STOCK', 'OUT_OF_STOCK', 'REORDER', 'OVERSTOCK', 'EXPIRY', 'SYSTEM', 'CUSTOM')
+alert_type_enum = postgresql.ENUM(*ALERT_TYPES, name='alerttype', create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    bind = op.get_bind()
+    if bind.dialect.has_type(bind, 'alerttype'):
+        # A new label cannot be used in the transaction that adds it
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE alerttype ADD VALUE IF NOT EXISTS 'OUT_OF_STOCK'")
+    else:
+        alert_type_enum.create(bind)
+
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('alerts')}
+    if 'alert_type' not in columns:
+        op.add_column('alerts', sa.Column('alert_type', alert_type_enum, nullable=True))
+        # Unknown free-form types become CUSTOM
+        op.execute(f"""
+            UPDATE alerts
+            SET alert_type = CASE
+                WHEN upper(type) IN ({', '.join(f"'{label}'" for label in ALERT_TYPES)})
+                THEN upper(type)::alerttype
+                ELSE 'CUSTOM'::alerttype
+            END
+        """)
+        op.alter_column('alerts', 'alert_type', nullable=False)
+        op.drop_index('ix_alerts_type', table_name='alerts')
+        op.drop_column('alerts', 'type')
+    if 'title' not in columns:
+        op.add_column('alerts', sa.Column('title', sa.String(length=200), nullable=True))
+        op.execute("UPDATE alerts SET title = left(initcap(replace(alert_type::text, '_', ' ')), 200)")
+        op.alter_column('alerts', 'title', nullable=False)
+    if 'is_resolved' not in columns:
+        op.add_column('alerts', sa.Column('is_resolved', sa.Boolean(), nullable=True, server_default=sa.false()))
+    if 'is_active' not in columns:
+        op.add_column('alerts', sa.Column('is_active', sa.Boolean(), nullable=True, server_default=sa.true()))
+
+    # Keep only the newest unread alert per item and type before enforcing uniqueness
+    op.execute("""
+        DELETE FROM alerts a
+        USING alerts b
+        WHERE a.is_read = false
+          AND b.is_read = false
+          AND a.item_id = b.item_id
+          AND a.alert_type = b.alert_type
+          AND a.id < b.id
+    """)
+
+    op.create_index(
+        'alerts_open_uniq',
+        'alerts',
+        ['item_id', 'alert_type'],
+        unique=True,
+        postgresql_where=sa.text('is_read = false')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    # PostgreSQL cannot drop an enum label; alerttype and OUT_OF_STOCK stay
+    op.drop_index('alerts_open_uniq', table_name='alerts')
+    op.drop_column('alerts', 'is_active')
+    op.drop_column('alerts', 'is_resolved')
+    op.drop_column('alerts', 'title')
+    op.add_column('alerts', sa.Column('type', sa.String(length=50), nullable=True))
+    op.execute("UPDATE alerts SET type = lower(alert_type::text)")
+    op.alter_column('alerts', 'type', nullable=False)
+    op.create_index(op.f('ix_alerts_type'), 'alerts', ['type'], unique=False)
+    op.drop_column('alerts', 'alert_type')
@@ -0,0 +1,31 @@
+"""Add covering index for item listings
+
+Revision ID: 3a9e6c1f5b82
+Revises: 8f3b2d6a4c17
+Create Date: 2026-10-14 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9e6c1f5b82'
+down_revision = '8f3b2d6a4c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    op.create_index(
+        'items_list_idx',
+        'items',
+        ['location_id', 'category_id'],
+        postgresql_include=['sku', 'name', 'quantity', 'reorder_point', 'max_stock', 'price']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    op.drop_index('items_list_idx', table_name='items')
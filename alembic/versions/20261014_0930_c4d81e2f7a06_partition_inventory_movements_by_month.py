@@ -0,0 +1,151 @@
+"""Partition inventory_movements by month
+
+Revision ID: c4d81e2f7a06
+Revises: 3a9e6c1f5b82
+Create Date: 2026-10-14 09:30:00.000000
+
+Rebuilds inventory_movements as a table range-partitioned on created_at,
+with one partition per month from the oldest movement up to twelve months
+ahead and a DEFAULT partition for anything outside that range. The primary
+key becomes (id, created_at) since a partitioned table's unique constraints
+must include the partition key; ids still come from the same sequence.
+Existing indexes and foreign keys are recreated on the new table, and a BRIN
+index on (created_at, item_id) serves time-range reports.
+
+Partitions for later months are not created automatically: schedule
+create_inventory_movement_partitions(months_ahead) (or pg_partman) to run
+before the twelve-month horizon is reached, otherwise new rows land in the
+DEFAULT partition.
+
+The existing rows are copied inside the migration, so run it in a
+maintenance window on large tables.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d81e2f7a06'
+down_revision = '3a9e6c1f5b82'
+branch_labels = None
+depends_on = None
+
+
+def _index_defs(table: str):
+    """CREATE INDEX statements of a table's indexes, primary key excluded"""
+    return op.get_bind().execute(sa.text("""
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = :table
+          AND indexname <> :table || '_pkey'
+    """), {'table': table}).all()
+
+
+def _foreign_key_defs(table: str):
+    """Names and definitions of a table's foreign keys"""
+    return op.get_bind().execute(sa.text("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'
+    """), {'table': table}).all()
+
+
+def _rebuild(old: str, create_statements, index_defs, foreign_key_defs) -> None:
+    """Recreate inventory_movements from the renamed table old"""
+    for statement in create_statements:
+        op.execute(statement)
+    op.execute(f"INSERT INTO inventory_movements SELECT * FROM {old}")
+
+    # The id sequence is owned by the old table and would be dropped with it
+    op.execute(f"""
+        DO $$
+        BEGIN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY inventory_movements.id',
+                           pg_get_serial_sequence('{old}', 'id'));
+        END $$
+    """)
+    op.execute(f"DROP TABLE {old} CASCADE")
+
+    for name, definition in foreign_key_defs:
+        op.execute(f"ALTER TABLE inventory_movements ADD CONSTRAINT {name} {definition}")
+    for _, definition in index_defs:
+        op.execute(definition)
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    index_defs = _index_defs('inventory_movements')
+    foreign_key_defs = _foreign_key_defs('inventory_movements')
+
+    op.execute("ALTER TABLE inventory_movements RENAME TO inventory_movements_old")
+    op.execute("ALTER INDEX inventory_movements_pkey RENAME TO inventory_movements_old_pkey")
+    op.execute("UPDATE inventory_movements_old SET created_at = now() WHERE created_at IS NULL")
+
+    _rebuild(
+        'inventory_movements_old',
+        [
+            """
+            CREATE TABLE inventory_movements (
+                LIKE inventory_movements_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+            """,
+            "ALTER TABLE inventory_movements ALTER COLUMN created_at SET DEFAULT now()",
+            """
+            CREATE OR REPLACE FUNCTION create_inventory_movement_partitions(
+                months_ahead integer, from_month date DEFAULT date_trunc('month', now())::date
+            ) RETURNS void AS $$
+            DECLARE
+                month date := date_trunc('month', from_month)::date;
+            BEGIN
+                WHILE month <= date_trunc('month', now()) + make_interval(months => months_ahead) LOOP
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS %I PARTITION OF inventory_movements FOR VALUES FROM (%L) TO (%L)',
+                        'inventory_movements_' || to_char(month, 'YYYY_MM'),
+                        month, month + interval '1 month'
+                    );
+                    month := month + interval '1 month';
+                END LOOP;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            """
+            SELECT create_inventory_movement_partitions(
+                12, COALESCE((SELECT min(created_at) FROM inventory_movements_old), now())::date
+            )
+            """,
+            "CREATE TABLE inventory_movements_default PARTITION OF inventory_movements DEFAULT"
+        ],
+        index_defs,
+        foreign_key_defs
+    )
+
+    op.execute("""
+        CREATE INDEX mov_brin ON inventory_movements
+        USING brin (created_at, item_id) WITH (pages_per_range = 32)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    index_defs = [
+        (name, definition) for name, definition in _index_defs('inventory_movements')
+        if name != 'mov_brin'
+    ]
+    foreign_key_defs = _foreign_key_defs('inventory_movements')
+
+    op.execute("ALTER TABLE inventory_movements RENAME TO inventory_movements_partitioned")
+    op.execute("ALTER INDEX inventory_movements_pkey RENAME TO inventory_movements_partitioned_pkey")
+
+    _rebuild(
+        'inventory_movements_partitioned',
+        [
+            """
+            CREATE TABLE inventory_movements (
+                LIKE inventory_movements_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+                PRIMARY KEY (id)
+            )
+            """
+        ],
+        index_defs,
+        foreign_key_defs
+    )
+    op.execute("DROP FUNCTION IF EXISTS create_inventory_movement_partitions(integer, date)")
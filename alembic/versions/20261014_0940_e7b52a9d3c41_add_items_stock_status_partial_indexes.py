@@ -0,0 +1,36 @@
+"""Add partial indexes for item stock status filters
+
+Revision ID: e7b52a9d3c41
+Revises: c4d81e2f7a06
+Create Date: 2026-10-14 09:40:00.000000
+
+The planner only uses a partial index when the query's WHERE clause implies
+the index predicate, so these predicates must stay textually in step with
+_STOCK_STATUS_FILTERS in src/services/inventory_service.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b52a9d3c41'
+down_revision = 'c4d81e2f7a06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    op.create_index('items_low_stock', 'items', ['id'],
+                    postgresql_where=sa.text('quantity <= reorder_point'))
+    op.create_index('items_oos', 'items', ['id'],
+                    postgresql_where=sa.text('quantity = 0'))
+    op.create_index('items_over', 'items', ['id'],
+                    postgresql_where=sa.text('quantity > max_stock'))
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    op.drop_index('items_over', table_name='items')
+    op.drop_index('items_oos', table_name='items')
+    op.drop_index('items_low_stock', table_name='items')
@@ -0,0 +1,77 @@
+"""Move 2FA backup codes into a hashed user_backup_codes table
+
+Revision ID: b6f29d4e8a15
+Revises: e7b52a9d3c41
+Create Date: 2026-10-14 09:50:00.000000
+
+Backup codes are stored as HMAC-SHA256 digests keyed with
+BACKUP_CODE_PEPPER (the same environment variable the application uses),
+so run the upgrade with the production pepper set; it refuses to run
+without one. Existing plain-text
+codes are hashed into the new table and cleared from users.backup_codes;
+the downgrade cannot recover them, users have to regenerate their codes.
+"""
+import hashlib
+import hmac
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f29d4e8a15'
+down_revision = 'e7b52a9d3c41'
+branch_labels = None
+depends_on = None
+
+
+def _hash_backup_code(pepper: bytes, user_id: int, code: str) -> str:
+    """Digest of a backup code, matching TwoFactorService"""
+    return hmac.new(pepper, f"{user_id}:{code.upper()}".encode(), hashlib.sha256).hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    # Fail before changing anything: digests made with a wrong key are useless
+    pepper = os.getenv("BACKUP_CODE_PEPPER")
+    if not pepper:
+        raise RuntimeError("BACKUP_CODE_PEPPER environment variable must be set to hash 2FA backup codes")
+    pepper = pepper.encode()
+    
+    op.create_table(
+        'user_backup_codes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('code_hash', sa.String(length=64), nullable=False),
+        sa.Column('used_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_backup_codes_id'), 'user_backup_codes', ['id'], unique=False)
+    op.create_index('uq_user_backup_code', 'user_backup_codes', ['user_id', 'code_hash'], unique=True)
+
+    # Hash the codes still held in users.backup_codes
+    bind = op.get_bind()
+    users = bind.execute(sa.text(
+        "SELECT id, backup_codes FROM users WHERE backup_codes IS NOT NULL"
+    )).all()
+    rows = [
+        {'user_id': user_id, 'code_hash': code_hash}
+        for user_id, codes in users
+        for code_hash in {_hash_backup_code(pepper, user_id, code) for code in codes or []}
+    ]
+    if rows:
+        bind.execute(sa.text("""
+            INSERT INTO user_backup_codes (user_id, code_hash, created_at)
+            VALUES (:user_id, :code_hash, now())
+        """), rows)
+    op.execute("UPDATE users SET backup_codes = NULL WHERE backup_codes IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    op.drop_index('uq_user_backup_code', table_name='user_backup_codes')
+    op.drop_index(op.f('ix_user_backup_codes_id'), table_name='user_backup_codes')
+    op.drop_table('user_backup_codes')
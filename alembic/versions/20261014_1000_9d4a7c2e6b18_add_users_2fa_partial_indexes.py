@@ -0,0 +1,36 @@
+"""Add partial indexes for 2FA users
+
+Revision ID: 9d4a7c2e6b18
+Revises: b6f29d4e8a15
+Create Date: 2026-10-14 10:00:00.000000
+
+Built CONCURRENTLY so the users table stays writable (logins keep working)
+while the indexes are created; that needs to run outside a transaction.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4a7c2e6b18'
+down_revision = 'b6f29d4e8a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_2fa_enabled', 'users', ['id'],
+                        postgresql_where=sa.text('two_factor_enabled = true'),
+                        postgresql_concurrently=True)
+        op.create_index('ix_users_totp_secret', 'users', ['id'],
+                        postgresql_where=sa.text('two_factor_secret IS NOT NULL'),
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_totp_secret', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_2fa_enabled', table_name='users', postgresql_concurrently=True)
@@ -0,0 +1,27 @@
+"""Add last accepted TOTP counter to users
+
+Revision ID: 3e8c5b1d7f92
+Revises: 9d4a7c2e6b18
+Create Date: 2026-10-14 10:10:00.000000
+
+Nullable with no default, so adding the column is a catalog-only change.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8c5b1d7f92'
+down_revision = '9d4a7c2e6b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    op.add_column('users', sa.Column('two_factor_last_counter', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    op.drop_column('users', 'two_factor_last_counter')
@@ -0,0 +1,29 @@
+"""Drop the legacy users.backup_codes column
+
+Revision ID: 6b1f8e3a9c54
+Revises: 3e8c5b1d7f92
+Create Date: 2026-10-14 10:20:00.000000
+
+Backup codes live in user_backup_codes since b6f29d4e8a15, which already
+emptied this column. Downgrade restores the column empty; the stored codes
+are hashes and cannot be copied back.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b1f8e3a9c54'
+down_revision = '3e8c5b1d7f92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema"""
+    op.drop_column('users', 'backup_codes')
+
+
+def downgrade() -> None:
+    """Downgrade database schema"""
+    op.add_column('users', sa.Column('backup_codes', sa.JSON(), nullable=True))
@@ -418,6 +418,7 @@ def get_inventory_summary(
 async def get_inventory_items(
     page: int = 1,
     page_size: int = 50,
+    after_id: Optional[int] = None,
     category_id: Optional[int] = None,
     supplier_id: Optional[int] = None,
     location_id: Optional[int] = None,
@@ -443,6 +444,8 @@ async def get_inventory_items(
             filters['search'] = search
         
         pagination = {'page': page, 'page_size': page_size}
+        if after_id is not None:
+            pagination['after_id'] = after_id
         
         result = await service.get_items(filters, pagination)
         return result
@@ -2,17 +2,17 @@
 2FA API Routes for Enterprise Inventory Management System
 Handles TOTP setup, verification, and backup codes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 import logging
 
 from ...database import get_db, get_sync_db
 from ...services.auth_service import AuthService
 from ...services.two_factor_service import TwoFactorService
-from ...models import User
+from ...models import User, UserRole
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
@@ -22,7 +22,8 @@ router = APIRouter(prefix="/api/2fa", tags=["Two-Factor Authentication"])
 # Pydantic models for request/response
 class TwoFactorSetupResponse(BaseModel):
     secret: str = Field(..., description="TOTP secret key")
-    qr_code: str = Field(..., description="Base64 encoded QR code image")
+    qr_code: Optional[str] = Field(None, description="Base64 encoded QR code image (omitted when deferred)")
+    qr_code_url: Optional[str] = Field(None, description="Where to fetch the QR code when it is deferred")
     backup_codes: List[str] = Field(..., description="List of backup codes")
     manual_entry_key: str = Field(..., description="Manual entry key for authenticator apps")
 
@@ -96,8 +97,41 @@ def get_2fa_status(
             detail="Failed to get 2FA status"
         )
 
+@router.get("/status/bulk", response_model=Dict[int, TwoFactorStatusResponse])
+def get_2fa_status_bulk(
+    user_ids: List[int] = Query(..., description="Users to report on", max_length=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_sync_db)
+):
+    """Get 2FA status for several users (admin only)"""
+    try:
+        if current_user.role != UserRole.ADMIN:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin access required"
+            )
+        
+        two_factor_service = TwoFactorService(db)
+        status_results = two_factor_service.get_2fa_status_bulk(user_ids)
+        
+        return {
+            user_id: TwoFactorStatusResponse(**status_result)
+            for user_id, status_result in status_results.items()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get bulk 2FA status failed: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get 2FA status"
+        )
+
 @router.post("/setup", response_model=TwoFactorSetupResponse)
 def setup_2fa(
+    background_tasks: BackgroundTasks,
+    defer_qr_code: bool = Query(False, description="Return before rendering the QR code; fetch it from qr_code_url"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_sync_db)
 ):
@@ -122,7 +156,16 @@ def setup_2fa(
             )
         
         # Setup 2FA
-        setup_result = two_factor_service.setup_2fa_for_user(current_user.id)
+        setup_result = two_factor_service.setup_2fa_for_user(
+            current_user.id, render_qr_code=not defer_qr_code
+        )
+        
+        if defer_qr_code:
+            # Render after the response so the qr-code endpoint is served from cache
+            background_tasks.add_task(
+                two_factor_service.generate_qr_code, setup_result["email"], setup_result["secret"]
+            )
+            setup_result["qr_code_url"] = router.url_path_for("get_qr_code")
         
         logger.info(f"2FA setup initiated for user {current_user.id}")
         return TwoFactorSetupResponse(**setup_result)
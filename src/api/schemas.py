@@ -246,6 +246,7 @@ class ItemListResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_after_id: Optional[int] = None
 
 # ================================
 # STOCK MOVEMENT SCHEMAS
@@ -509,6 +510,8 @@ class StockCountResponse(BaseModel):
     started_at: datetime
     location_id: Optional[int]
     total_items: int
+    total_quantity: int = 0
+    total_value: float = 0.0
     items: List[StockCountItem]
 
 class AnomalyDetectionResult(BaseModel):
@@ -35,6 +35,7 @@ class MovementType(PyEnum):
 class AlertType(PyEnum):
     """Alert type enumeration"""
     LOW_STOCK = "low_stock"
+    OUT_OF_STOCK = "out_of_stock"
     REORDER = "reorder"
     OVERSTOCK = "overstock"
     EXPIRY = "expiry"
@@ -76,7 +77,7 @@ class User(Base):
     # 2FA/MFA fields
     two_factor_enabled = Column(Boolean, default=False)
     two_factor_secret = Column(String(255))
-    backup_codes = Column(JSON)
+    two_factor_last_counter = Column(Integer)  # last accepted TOTP time step, for replay checks
     two_factor_setup_complete = Column(Boolean, default=False)
     
     created_at = Column(DateTime, default=func.now())
@@ -87,10 +88,40 @@ class User(Base):
     alerts = relationship("Alert", back_populates="user")
     rules = relationship("InventoryRule", back_populates="created_by")
     
+    # Indexes
+    __table_args__ = (
+        # 2FA users are a small minority; partial indexes keep 2FA counts and
+        # filters off sequential scans
+        Index('ix_users_2fa_enabled', 'id', postgresql_where=(two_factor_enabled == True)),
+        Index('ix_users_totp_secret', 'id', postgresql_where=(two_factor_secret.isnot(None))),
+    )
+    
     def __repr__(self):
         return f"<User(id={self.id}, email='{self.email}', name='{self.name}')>"
 
 
+class BackupCode(Base):
+    """Hashed 2FA backup code; used_at is set once the code is consumed"""
+    __tablename__ = "user_backup_codes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    code_hash = Column(String(64), nullable=False)  # HMAC-SHA256 hex digest
+    used_at = Column(DateTime)
+    created_at = Column(DateTime, default=func.now())
+    
+    # Relationships
+    user = relationship("User")
+    
+    # Indexes
+    __table_args__ = (
+        Index('uq_user_backup_code', 'user_id', 'code_hash', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<BackupCode(id={self.id}, user_id={self.user_id}, used={self.used_at is not None})>"
+
+
 class Category(Base):
     """Product category model"""
     __tablename__ = "categories"
@@ -237,6 +268,14 @@ class Item(Base):
         Index('idx_item_category_supplier', 'category_id', 'supplier_id'),
         Index('idx_item_location_active', 'location_id', 'is_active'),
         Index('idx_item_quantity_levels', 'quantity', 'min_stock', 'reorder_point'),
+        # Covering index for location/category listings (index-only scans)
+        Index('items_list_idx', 'location_id', 'category_id',
+              postgresql_include=['sku', 'name', 'quantity', 'reorder_point', 'max_stock', 'price']),
+        # Partial indexes for the stock_status filters; predicates must match
+        # InventoryService's _STOCK_STATUS_FILTERS exactly
+        Index('items_low_stock', 'id', postgresql_where=(quantity <= reorder_point)),
+        Index('items_oos', 'id', postgresql_where=(quantity == 0)),
+        Index('items_over', 'id', postgresql_where=(quantity > max_stock)),
     )
     
     def __repr__(self):
@@ -288,6 +327,10 @@ class InventoryMovement(Base):
         Index('idx_movement_item_date', 'item_id', 'movement_date'),
         Index('idx_movement_type_date', 'movement_type', 'movement_date'),
         Index('idx_movement_reference', 'reference_type', 'reference_id'),
+        # Time-range scans; the table itself is partitioned by month on
+        # created_at in migrations, which create_all does not reproduce
+        Index('mov_brin', 'created_at', 'item_id', postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
     )
     
     def __repr__(self):
@@ -331,6 +374,10 @@ class Alert(Base):
         Index('idx_alert_type_severity', 'alert_type', 'severity'),
         Index('idx_alert_status', 'is_read', 'is_resolved', 'is_active'),
         Index('idx_alert_created', 'created_at'),
+        # At most one unread alert per item and type; stock alert inserts
+        # use it as their ON CONFLICT target
+        Index('alerts_open_uniq', 'item_id', 'alert_type', unique=True,
+              postgresql_where=(is_read == False)),
     )
     
     def __repr__(self):
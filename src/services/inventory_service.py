@@ -2,27 +2,149 @@
 Core Inventory Management Services
 Provides comprehensive inventory operations and business logic
 """
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, Tuple, AsyncIterator, NamedTuple
 from datetime import datetime, timedelta
 import logging
-from sqlalchemy.orm import Session
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, or_, func, select, text
-from ..models import Item, Category, Supplier, Location, InventoryMovement, User, Alert
+import operator
+from functools import lru_cache
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import and_, bindparam, case, func, select, text, insert, update, values, column, table, literal, literal_column, Integer, Text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from ..models import Item, Category, Supplier, Location, InventoryMovement, User, Alert, AlertType, AlertSeverity
 from ..database import get_db
 from .rules_engine import RulesEngine
 from .analytics_engine import AnalyticsEngine
 import asyncio
 from uuid import uuid4
+import io
+import msgspec
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round trip when streaming stock counts
+STOCK_COUNT_CHUNK_SIZE = 5000
+
+# Filter keys handled by InventoryService._apply_filters
+_EQ_FILTERS = {
+    'category_id': Item.category_id,
+    'supplier_id': Item.supplier_id,
+    'location_id': Item.location_id
+}
+
+_RANGE_FILTERS = {
+    'min_quantity': (Item.quantity, operator.ge),
+    'max_quantity': (Item.quantity, operator.le),
+    'min_price': (Item.price, operator.ge),
+    'max_price': (Item.price, operator.le)
+}
+
+# Each predicate matches a partial index (items_low_stock, items_oos,
+# items_over); keep them in step with the index definitions. The zero is
+# inlined so prepared statements still match items_oos.
+_STOCK_STATUS_FILTERS = {
+    'low_stock': Item.quantity <= Item.reorder_point,
+    'out_of_stock': Item.quantity == literal_column('0'),
+    'overstock': Item.quantity > Item.max_stock,
+    'normal': and_(Item.quantity > Item.reorder_point, Item.quantity <= Item.max_stock)
+}
+
+# SQL counterpart of _get_stock_status, for queries that return the status per row
+_STOCK_STATUS_SQL = case(
+    (Item.quantity == 0, 'out_of_stock'),
+    (Item.quantity <= Item.reorder_point, 'low_stock'),
+    (Item.quantity > Item.max_stock, 'overstock'),
+    else_='normal'
+).label('stock_status')
+
+# Item columns covered by items_list_idx (keys plus INCLUDE); queries that read
+# only these, filtered by location/category, can run as index-only scans
+_LIST_COLS = (Item.id, Item.sku, Item.name, Item.quantity, Item.reorder_point,
+              Item.max_stock, Item.price, Item.category_id, Item.location_id)
+
+# Remaining columns of the full item listing
+_LIST_DETAIL_COLS = (Item.description, Item.cost, Item.created_at, Item.updated_at)
+
+# Text searched by the 'search' filter. Separators are inlined rather than
+# bound so the expression matches the ix_items_search_trgm GIN index.
+_SEARCH_DOCUMENT = Item.name + literal_column("' '") + Item.sku + literal_column("' '") \
+    + func.coalesce(Item.description, literal_column("''"))
+
+@lru_cache(maxsize=256)
+def _filter_criteria(signature: Tuple[Tuple[str, Optional[str]], ...]) -> Tuple:
+    """Build the WHERE criteria for a filter signature
+    
+    The signature holds each filter key, plus the status for 'stock_status'
+    since that selects a different clause. All other values are left as
+    filter_<key> bind parameters, so one cached tuple serves every request
+    with the same filter keys.
+    """
+    criteria = []
+    for key, status in signature:
+        if key in _EQ_FILTERS:
+            criteria.append(_EQ_FILTERS[key] == bindparam(f'filter_{key}'))
+        elif key in _RANGE_FILTERS:
+            column_attr, compare = _RANGE_FILTERS[key]
+            criteria.append(compare(column_attr, bindparam(f'filter_{key}')))
+        elif key == 'stock_status':
+            criteria.append(_STOCK_STATUS_FILTERS[status])
+        elif key == 'search':
+            criteria.append(_SEARCH_DOCUMENT.ilike(bindparam('filter_search')))
+    return tuple(criteria)
+
+# Columns read by _check_stock_alerts_bulk; item loads that feed it use this
+# so the alert check never triggers a per-item refresh of the full row
+_ITEM_ALERT_COLS = load_only(Item.id, Item.name, Item.quantity, Item.reorder_point, Item.max_stock)
+
+class StockCountLine(msgspec.Struct):
+    """Pending stock count line, encoded straight to JSON without a dict"""
+    id: int
+    sku: str
+    name: str
+    system_quantity: int
+    counted_quantity: Optional[int] = None
+    variance: Optional[int] = None
+    status: str = 'pending'
+
+_json_encoder = msgspec.json.Encoder()
+
+class _StockThresholds(NamedTuple):
+    """Tuple view of the item columns stock status is derived from"""
+    id: int
+    quantity: int
+    reorder_point: int
+    max_stock: int
+
+# Leading columns of queries whose rows are read as _StockThresholds
+_STOCK_THRESHOLD_COLS = (Item.id, Item.quantity, Item.reorder_point, Item.max_stock)
+
+_driver_checked = False
+
+def _check_async_driver(db_session: AsyncSession):
+    """Warn once if async sessions are not running on asyncpg"""
+    global _driver_checked
+    if _driver_checked:
+        return
+    _driver_checked = True
+    
+    bind = db_session.bind
+    driver = bind.dialect.driver if bind is not None else None
+    if driver != 'asyncpg':
+        logger.warning(f"Async inventory session uses driver {driver!r}; asyncpg is expected")
+
 class InventoryService:
     """Core inventory management service"""
     
-    def __init__(self, db_session: Union[Session, AsyncSession]):
+    def __init__(self, db_session: Union[Session, AsyncSession],
+                 session_factory: Optional[async_sessionmaker] = None):
         self.db_session = db_session
+        # Optional source of extra async sessions for queries that can run
+        # alongside the main session's (e.g. AsyncSessionLocal)
+        self.session_factory = session_factory
         self.is_async = isinstance(db_session, AsyncSession)
+        if self.is_async:
+            _check_async_driver(db_session)
         if isinstance(db_session, Session):
             self.rules_engine = RulesEngine(db_session)
             self.analytics_engine = AnalyticsEngine(db_session)
@@ -32,19 +154,18 @@ class InventoryService:
         try:
             logger.info("Retrieving inventory summary")
             
+            query = select(Item.quantity, Item.price, Item.reorder_point,
+                           Category.name.label('category'))\
+                .outerjoin(Category, Item.category_id == Category.id)
+            params = {}
+            if filters:
+                query, params = self._apply_filters(query, filters)
+            
             if self.is_async:
-                # Use async session with select syntax
-                query = select(Item)
-                if filters:
-                    query = self._apply_filters_async(query, filters)
-                result = await self.db_session.execute(query)
-                items = result.scalars().all()
+                result = await self.db_session.execute(query, params)
             else:
-                # Use sync session with query syntax
-                query = self.db_session.query(Item)
-                if filters:
-                    query = self._apply_filters(query, filters)
-                items = query.all()
+                result = self.db_session.execute(query, params)
+            items = result.all()
             
             # Calculate summary metrics
             total_items = len(items)
@@ -58,7 +179,7 @@ class InventoryService:
             # Category breakdown
             categories = {}
             for item in items:
-                cat_name = item.category.name if item.category else 'Uncategorized'
+                cat_name = item.category or 'Uncategorized'
                 if cat_name not in categories:
                     categories[cat_name] = {'count': 0, 'value': 0}
                 categories[cat_name]['count'] += 1
@@ -84,64 +205,58 @@ class InventoryService:
         try:
             logger.info("Retrieving inventory items")
             
+            # Project the response columns and related names in one query
+            # rather than loading Item entities and their relationships
+            query = select(Item)\
+                .outerjoin(Category, Item.category_id == Category.id)\
+                .outerjoin(Supplier, Item.supplier_id == Supplier.id)\
+                .outerjoin(Location, Item.location_id == Location.id)\
+                .with_only_columns(*_LIST_COLS, *_LIST_DETAIL_COLS, _STOCK_STATUS_SQL,
+                                   Category.name.label('category'),
+                                   Supplier.name.label('supplier'),
+                                   Location.name.label('location'))
+            count_query = select(func.count(Item.id))
+            params = {}
+            if filters:
+                query, params = self._apply_filters(query, filters)
+                count_query, _ = self._apply_filters(count_query, filters)
+            
+            if pagination:
+                query = self._paginate(query, pagination)
+            
             if self.is_async:
-                # Use async session with select syntax
-                query = select(Item)
-                if filters:
-                    query = self._apply_filters_async(query, filters)
-                
-                # Count total items
-                count_query = select(func.count(Item.id))
-                if filters:
-                    count_query = self._apply_filters_async(count_query, filters)
-                count_result = await self.db_session.execute(count_query)
-                total_items = count_result.scalar()
-                
-                # Apply pagination
-                if pagination:
-                    page = pagination.get('page', 1)
-                    page_size = pagination.get('page_size', 50)
-                    offset = (page - 1) * page_size
-                    query = query.offset(offset).limit(page_size)
-                
-                result = await self.db_session.execute(query)
-                items = result.scalars().all()
+                total_items = (await self.db_session.execute(count_query, params)).scalar()
+                rows = (await self.db_session.execute(query, params)).all()
             else:
-                # Use sync session with query syntax
-                query = self.db_session.query(Item)
-                if filters:
-                    query = self._apply_filters(query, filters)
-                
-                total_items = query.count()
-                
-                if pagination:
-                    page = pagination.get('page', 1)
-                    page_size = pagination.get('page_size', 50)
-                    offset = (page - 1) * page_size
-                    query = query.offset(offset).limit(page_size)
-                
-                items = query.all()
+                total_items = self.db_session.execute(count_query, params).scalar()
+                rows = self.db_session.execute(query, params).all()
+            
+            # _paginate fetches one extra row to tell whether a next page exists
+            page_size = pagination.get('page_size', 50) if pagination else None
+            has_more = page_size is not None and len(rows) > page_size
+            if has_more:
+                rows = rows[:page_size]
             
             # Convert to dict format
             items_data = []
-            for item in items:
+            for row in rows:
                 item_data = {
-                    'id': item.id,
-                    'sku': item.sku,
-                    'name': item.name,
-                    'description': item.description,
-                    'quantity': item.quantity,
-                    'unit_price': item.price,
-                    'cost_price': item.cost,
-                    'reorder_point': item.reorder_point,
-                    'max_stock': item.max_stock,
-                    'category': item.category.name if item.category else None,
-                    'supplier': item.supplier.name if item.supplier else None,
-                    'location': item.location.name if item.location else None,
-                    'stock_status': self._get_stock_status(item),
-                    'total_value': item.quantity * item.price,
-                    'created_at': item.created_at,
-                    'updated_at': item.updated_at
+                    'id': row.id,
+                    'sku': row.sku,
+                    'name': row.name,
+                    'description': row.description,
+                    'quantity': row.quantity,
+                    'unit_price': row.price,
+                    'cost_price': row.cost,
+                    'reorder_point': row.reorder_point,
+                    'max_stock': row.max_stock,
+                    'category': row.category,
+                    'supplier': row.supplier,
+                    'location': row.location,
+                    'stock_status': row.stock_status,
+                    'total_value': row.quantity * row.price,
+                    'created_at': row.created_at,
+                    'updated_at': row.updated_at
                 }
                 items_data.append(item_data)
             
@@ -150,7 +265,8 @@ class InventoryService:
                 'total_items': total_items,
                 'page': pagination.get('page', 1) if pagination else 1,
                 'page_size': pagination.get('page_size', len(items_data)) if pagination else len(items_data),
-                'total_pages': (total_items + pagination.get('page_size', 50) - 1) // pagination.get('page_size', 50) if pagination else 1
+                'total_pages': (total_items + pagination.get('page_size', 50) - 1) // pagination.get('page_size', 50) if pagination else 1,
+                'next_after_id': items_data[-1]['id'] if has_more else None
             }
             
         except Exception as e:
@@ -302,11 +418,12 @@ class InventoryService:
             # Create initial stock movement if quantity > 0
             if item_data.get('quantity', 0) > 0:
                 await self._create_movement(
-                    item.id,
+                    item,
                     'INBOUND',
                     item_data['quantity'],
                     user_id,
-                    'Initial stock entry'
+                    'Initial stock entry',
+                    flush=False
                 )
             
             logger.info(f"Item created successfully: {item.id}")
@@ -353,26 +470,28 @@ class InventoryService:
             # Track quantity changes
             old_quantity = item.quantity
             
-            # Update item fields
-            for field, value in item_data.items():
-                if hasattr(item, field):
-                    setattr(item, field, value)
-            
-            item.updated_at = datetime.now()
-            
-            # Create movement record for quantity changes
+            # Create movement record for quantity changes (before the item
+            # row changes, so the movement captures the old quantity)
             if 'quantity' in item_data and item_data['quantity'] != old_quantity:
                 movement_type = 'ADJUSTMENT'
                 quantity_change = item_data['quantity'] - old_quantity
                 
                 await self._create_movement(
-                    item_id,
+                    item,
                     movement_type,
                     quantity_change,
                     user_id,
-                    f"Quantity adjusted from {old_quantity} to {item_data['quantity']}"
+                    f"Quantity adjusted from {old_quantity} to {item_data['quantity']}",
+                    flush=False
                 )
             
+            # Update item fields
+            for field, value in item_data.items():
+                if hasattr(item, field):
+                    setattr(item, field, value)
+            
+            item.updated_at = datetime.now()
+            
             # Commit with proper async/sync handling
             if self.is_async:
                 await self.db_session.commit()
@@ -441,11 +560,11 @@ class InventoryService:
             
             # Get item with proper async/sync handling
             if self.is_async:
-                query = select(Item).where(Item.id == item_id)
+                query = select(Item).options(_ITEM_ALERT_COLS).where(Item.id == item_id)
                 result = await self.db_session.execute(query)
                 item = result.scalar_one_or_none()
             else:
-                item = self.db_session.query(Item).filter(Item.id == item_id).first()
+                item = self.db_session.query(Item).options(_ITEM_ALERT_COLS).filter(Item.id == item_id).first()
             
             if not item:
                 raise ValueError(f"Item with ID {item_id} not found")
@@ -456,34 +575,29 @@ class InventoryService:
             if new_quantity < 0:
                 raise ValueError("Cannot adjust stock below zero")
             
-            # Update item quantity
-            item.quantity = new_quantity
-            item.updated_at = datetime.now()
-            
             # Create movement record
-            movement_type = 'ADJUSTMENT'
-            if quantity_change > 0:
-                movement_type = 'INBOUND'
-            elif quantity_change < 0:
-                movement_type = 'OUTBOUND'
-            
             movement = await self._create_movement(
-                item_id,
-                movement_type,
+                item,
+                self._movement_type_for(quantity_change),
                 quantity_change,
                 user_id,
-                reason or f"Stock adjustment: {quantity_change}"
+                reason or f"Stock adjustment: {quantity_change}",
+                flush=False
             )
             
+            # Update item quantity
+            item.quantity = new_quantity
+            item.updated_at = datetime.now()
+            
+            # Check for alerts in the same transaction as the adjustment
+            await self._check_stock_alerts_bulk([item])
+            
             # Commit with proper async/sync handling
             if self.is_async:
                 await self.db_session.commit()
             else:
                 self.db_session.commit()
             
-            # Check for alerts
-            await self._check_stock_alerts(item)
-            
             logger.info(f"Stock adjusted successfully: {item_id}")
             
             return {
@@ -541,7 +655,7 @@ class InventoryService:
                 raise ValueError("Quantity must be positive")
             
             # Check available stock
-            item = self.db_session.query(Item).filter(Item.id == item_id).first()
+            item = self.db_session.query(Item).options(_ITEM_ALERT_COLS).filter(Item.id == item_id).first()
             if not item:
                 raise ValueError(f"Item with ID {item_id} not found")
             
@@ -579,34 +693,42 @@ class InventoryService:
             if quantity <= 0:
                 raise ValueError("Quantity must be positive")
             
-            # Issue from source
-            from_result = await self.issue_stock(
-                from_item_id,
-                quantity,
-                user_id,
-                f"Transfer to item {to_item_id}",
-                notes
-            )
+            # Both legs go through one quantity UPDATE and one movement INSERT
+            from_movement, to_movement = await self._create_movements_bulk([
+                (from_item_id, -quantity, user_id, notes, f"Transfer to item {to_item_id}"),
+                (to_item_id, quantity, user_id, notes, f"Transfer from item {from_item_id}")
+            ])
             
-            # Receive at destination
-            to_result = await self.receive_stock(
-                to_item_id,
-                quantity,
-                user_id,
-                f"Transfer from item {from_item_id}",
-                notes
-            )
+            # Check for alerts
+            items_query = select(Item)\
+                .options(_ITEM_ALERT_COLS)\
+                .where(Item.id.in_([from_item_id, to_item_id]))\
+                .execution_options(populate_existing=True)
+            if self.is_async:
+                items_result = await self.db_session.execute(items_query)
+            else:
+                items_result = self.db_session.execute(items_query)
+            await self._check_stock_alerts_bulk(items_result.scalars().all())
+            
+            if self.is_async:
+                await self.db_session.commit()
+            else:
+                self.db_session.commit()
             
             return {
                 'from_item_id': from_item_id,
                 'to_item_id': to_item_id,
                 'quantity': quantity,
-                'from_movement_id': from_result['movement_id'],
-                'to_movement_id': to_result['movement_id'],
+                'from_movement_id': from_movement.id,
+                'to_movement_id': to_movement.id,
                 'timestamp': datetime.now()
             }
             
         except Exception as e:
+            if self.is_async:
+                await self.db_session.rollback()
+            else:
+                self.db_session.rollback()
             logger.error(f"Stock transfer failed: {str(e)}")
             raise
     
@@ -653,22 +775,30 @@ class InventoryService:
     async def get_low_stock_items(self) -> List[Dict[str, Any]]:
         """Get items with low stock levels"""
         try:
-            items = self.db_session.query(Item)\
-                .filter(Item.quantity <= Item.reorder_point)\
-                .order_by(Item.quantity.asc()).all()
+            query = select(*_STOCK_THRESHOLD_COLS, Item.sku, Item.name,
+                           Category.name.label('category'), Supplier.name.label('supplier'))\
+                .outerjoin(Category, Item.category_id == Category.id)\
+                .outerjoin(Supplier, Item.supplier_id == Supplier.id)\
+                .where(Item.quantity <= Item.reorder_point)\
+                .order_by(Item.quantity.asc())
+            if self.is_async:
+                result = await self.db_session.execute(query)
+            else:
+                result = self.db_session.execute(query)
             
             low_stock_items = []
-            for item in items:
+            for row in result:
+                thresholds = _StockThresholds._make(row[:4])
                 low_stock_items.append({
-                    'id': item.id,
-                    'sku': item.sku,
-                    'name': item.name,
-                    'quantity': item.quantity,
-                    'reorder_point': item.reorder_point,
-                    'category': item.category.name if item.category else None,
-                    'supplier': item.supplier.name if item.supplier else None,
-                    'stock_status': self._get_stock_status(item),
-                    'urgency': 'critical' if item.quantity == 0 else 'high' if item.quantity < item.reorder_point * 0.5 else 'medium'
+                    'id': thresholds.id,
+                    'sku': row.sku,
+                    'name': row.name,
+                    'quantity': thresholds.quantity,
+                    'reorder_point': thresholds.reorder_point,
+                    'category': row.category,
+                    'supplier': row.supplier,
+                    'stock_status': self._get_stock_status_row(thresholds),
+                    'urgency': 'critical' if thresholds.quantity == 0 else 'high' if thresholds.quantity < thresholds.reorder_point * 0.5 else 'medium'
                 })
             
             return low_stock_items
@@ -707,116 +837,408 @@ class InventoryService:
             logger.error(f"Overstock items retrieval failed: {str(e)}")
             raise
     
-    async def perform_stock_count(self, location_id: int = None) -> Dict[str, Any]:
-        """Perform stock count"""
+    async def perform_stock_count(self, location_id: int = None) -> Tuple[Dict[str, Any], AsyncIterator[StockCountLine]]:
+        """Perform stock count
+        
+        Returns the count metadata and an async iterator over the count
+        lines. Lines are streamed from a server-side cursor in chunks of
+        STOCK_COUNT_CHUNK_SIZE rows, so memory stays bounded for large
+        locations. Pass both to encode_stock_count to stream the count
+        as JSON. With a session_factory, the totals are aggregated on a
+        second session while the item stream is opened.
+        """
         try:
             logger.info(f"Performing stock count for location: {location_id}")
             
-            query = self.db_session.query(Item)
+            criteria = []
             if location_id:
-                query = query.filter(Item.location_id == location_id)
-            
-            items = query.all()
+                criteria.append(Item.location_id == location_id)
+            
+            stats_query = select(
+                func.count(Item.id).label('total_items'),
+                func.coalesce(func.sum(Item.quantity), 0).label('total_quantity'),
+                func.coalesce(func.sum(Item.quantity * Item.price), 0).label('total_value')
+            ).where(*criteria)
+            
+            items_query = select(Item.id, Item.sku, Item.name, Item.quantity)\
+                .where(*criteria)\
+                .order_by(Item.id)\
+                .execution_options(yield_per=STOCK_COUNT_CHUNK_SIZE)
+            
+            if self.is_async and self.session_factory is not None:
+                stats, items_result = await asyncio.gather(
+                    self._fetch_one_on_new_session(stats_query),
+                    self.db_session.stream(items_query)
+                )
+            elif self.is_async:
+                stats = (await self.db_session.execute(stats_query)).one()
+                items_result = await self.db_session.stream(items_query)
+            else:
+                stats = self.db_session.execute(stats_query).one()
+                items_result = self.db_session.execute(items_query)
             
-            count_id = str(uuid4())
             count_data = {
-                'count_id': count_id,
+                'count_id': str(uuid4()),
                 'started_at': datetime.now(),
                 'location_id': location_id,
-                'total_items': len(items),
-                'items': []
+                'total_items': stats.total_items,
+                'total_quantity': stats.total_quantity,
+                'total_value': float(stats.total_value)
             }
             
-            for item in items:
-                count_data['items'].append({
-                    'id': item.id,
-                    'sku': item.sku,
-                    'name': item.name,
-                    'system_quantity': item.quantity,
-                    'counted_quantity': None,
-                    'variance': None,
-                    'status': 'pending'
-                })
-            
-            return count_data
+            return count_data, self._stream_count_lines(items_result)
             
         except Exception as e:
             logger.error(f"Stock count failed: {str(e)}")
             raise
     
-    async def _create_movement(self, item_id: int, movement_type: str, 
-                              quantity: int, user_id: int, notes: str = None) -> InventoryMovement:
-        """Create inventory movement record"""
-        # Get current item to determine quantity_before
-        if self.is_async:
-            query = select(Item).where(Item.id == item_id)
-            result = await self.db_session.execute(query)
-            item = result.scalar_one_or_none()
-        else:
-            item = self.db_session.query(Item).filter(Item.id == item_id).first()
+    async def _fetch_one_on_new_session(self, query) -> Row:
+        """Run a single-row query on its own session from session_factory"""
+        async with self.session_factory() as session:
+            return (await session.execute(query)).one()
+    
+    async def _stream_count_lines(self, result) -> AsyncIterator[StockCountLine]:
+        """Yield stock count lines from an open streamed item result"""
+        try:
+            if self.is_async:
+                async for row in result:
+                    yield StockCountLine(row.id, row.sku, row.name, row.quantity)
+            else:
+                for row in result:
+                    yield StockCountLine(row.id, row.sku, row.name, row.quantity)
+        finally:
+            if self.is_async:
+                await result.close()
+            else:
+                result.close()
+    
+    @staticmethod
+    async def encode_stock_count(count_data: Dict[str, Any],
+                                 lines: AsyncIterator[StockCountLine]) -> AsyncIterator[bytes]:
+        """Encode a stock count as a StockCountResponse JSON document in chunks"""
+        # Header object with its closing brace swapped for the items array
+        buffer = bytearray(_json_encoder.encode(count_data)[:-1])
+        buffer += b',"items":['
         
-        if not item:
-            raise ValueError(f"Item with ID {item_id} not found")
+        written = 0
+        async for line in lines:
+            if written:
+                buffer += b','
+            _json_encoder.encode_into(line, buffer, -1)
+            written += 1
+            if written % STOCK_COUNT_CHUNK_SIZE == 0:
+                yield bytes(buffer)
+                buffer.clear()
+        
+        buffer += b']}'
+        yield bytes(buffer)
+    
+    async def apply_counts(self, count_id: str, counts: Dict[int, int], 
+                          user_id: int) -> Dict[str, Any]:
+        """Apply counted quantities from a stock count
+        
+        counts maps item_id to the counted quantity. The counts are copied
+        into a temporary table with COPY, then a single UPDATE ... FROM sets
+        the item quantities and inserts an ADJUSTMENT movement for every item
+        whose quantity changed. Unknown item ids are ignored.
+        """
+        try:
+            logger.info(f"Applying stock count {count_id}: {len(counts)} lines")
+            
+            negative = [item_id for item_id, qty in counts.items() if qty < 0]
+            if negative:
+                raise ValueError(f"Counted quantities cannot be negative: {negative}")
+            
+            create_tmp = text("CREATE TEMP TABLE tmp_counts (id integer PRIMARY KEY, qty integer NOT NULL) ON COMMIT DROP")
+            if self.is_async:
+                connection = await self.db_session.connection()
+                await connection.execute(create_tmp)
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    'tmp_counts', records=list(counts.items()), columns=['id', 'qty']
+                )
+            else:
+                connection = self.db_session.connection()
+                connection.execute(create_tmp)
+                buffer = io.StringIO(''.join(f"{item_id}\t{qty}\n" for item_id, qty in counts.items()))
+                with connection.connection.driver_connection.cursor() as cursor:
+                    cursor.copy_expert("COPY tmp_counts (id, qty) FROM STDIN", buffer)
+            
+            # The pre-update quantity is read under the row lock, so an
+            # adjustment committed while the count waits is not lost from
+            # quantity_before and the variance
+            tmp_counts = table('tmp_counts', column('id', Integer), column('qty', Integer))
+            items = Item.__table__
+            old = select(items.c.id, items.c.quantity, tmp_counts.c.qty)\
+                .join(tmp_counts, tmp_counts.c.id == items.c.id)\
+                .with_for_update(of=items)\
+                .subquery('old')
+            changed = update(items)\
+                .where(items.c.id == old.c.id, old.c.quantity != old.c.qty)\
+                .values(quantity=old.c.qty, updated_at=func.now())\
+                .returning(items.c.id,
+                           old.c.quantity.label('quantity_before'),
+                           old.c.qty.label('quantity_after'))\
+                .cte('changed')
+            
+            # Only columns the migrated table has; include_defaults would add
+            # model-only ones such as movement_date
+            movement_insert = insert(InventoryMovement).from_select(
+                ['item_id', 'movement_type', 'quantity', 'quantity_before', 'quantity_after',
+                 'user_id', 'reference_number', 'notes', 'created_at'],
+                select(
+                    changed.c.id,
+                    literal('ADJUSTMENT', InventoryMovement.__table__.c.movement_type.type),
+                    changed.c.quantity_after - changed.c.quantity_before,
+                    changed.c.quantity_before,
+                    changed.c.quantity_after,
+                    literal(user_id, Integer),
+                    literal(count_id),
+                    literal(f"Stock count {count_id}", Text),
+                    func.now()
+                ),
+                include_defaults=False
+            ).returning(
+                InventoryMovement.id,
+                InventoryMovement.item_id,
+                InventoryMovement.quantity,
+                InventoryMovement.quantity_before,
+                InventoryMovement.quantity_after
+            )
+            
+            if self.is_async:
+                result = await self.db_session.execute(movement_insert)
+                movements = result.all()
+                await self.db_session.commit()
+            else:
+                result = self.db_session.execute(movement_insert)
+                movements = result.all()
+                self.db_session.commit()
+            
+            logger.info(f"Stock count {count_id} applied: {len(movements)} items adjusted")
+            
+            return {
+                'count_id': count_id,
+                'items_counted': len(counts),
+                'items_adjusted': len(movements),
+                'adjustments': [
+                    {
+                        'item_id': movement.item_id,
+                        'movement_id': movement.id,
+                        'system_quantity': movement.quantity_before,
+                        'counted_quantity': movement.quantity_after,
+                        'variance': movement.quantity
+                    }
+                    for movement in movements
+                ],
+                'timestamp': datetime.now()
+            }
+            
+        except Exception as e:
+            if self.is_async:
+                await self.db_session.rollback()
+            else:
+                self.db_session.rollback()
+            logger.error(f"Stock count apply failed: {str(e)}")
+            raise
+    
+    async def _create_movement(self, item: Union[Item, int], movement_type: str, 
+                              quantity: int, user_id: int, notes: str = None,
+                              flush: bool = True) -> Row:
+        """Create inventory movement record
         
-        quantity_before = item.quantity
-        quantity_after = quantity_before + quantity
+        item is a loaded Item or an item id. A loaded Item supplies
+        quantity_before itself, so the movement is a plain INSERT. For an id,
+        quantity_before/quantity_after are taken from the item row inside
+        the INSERT ... SELECT, so no separate lookup is needed either. Either
+        way this must run before the quantity change is applied to the item.
+        Returns the (id, quantity_before, quantity_after) row of the new
+        movement.
         
+        The id comes back through RETURNING, so no flush is needed for it.
+        flush=False also skips the session's autoflush before the INSERT;
+        callers pass it when they have no pending changes the INSERT must
+        see, leaving the flush to their commit.
+        """
         # Don't set the id manually - let PostgreSQL auto-generate it
-        movement = InventoryMovement(
-            item_id=item_id,
-            movement_type=movement_type,
-            quantity=quantity,
-            quantity_before=quantity_before,
-            quantity_after=quantity_after,
-            user_id=user_id,
-            notes=notes
+        if isinstance(item, Item):
+            item_id = item.id
+            movement_query = insert(InventoryMovement).values(
+                item_id=item_id,
+                movement_type=movement_type,
+                quantity=quantity,
+                quantity_before=item.quantity,
+                quantity_after=item.quantity + quantity,
+                user_id=user_id,
+                notes=notes
+            )
+        else:
+            item_id = item
+            movement_query = insert(InventoryMovement).from_select(
+                ['item_id', 'movement_type', 'quantity', 'quantity_before',
+                 'quantity_after', 'user_id', 'notes'],
+                select(
+                    Item.id,
+                    literal(movement_type, InventoryMovement.__table__.c.movement_type.type),
+                    literal(quantity, Integer),
+                    Item.quantity,
+                    Item.quantity + quantity,
+                    literal(user_id, Integer),
+                    literal(notes, Text)
+                ).where(Item.id == item_id)
+            )
+        movement_query = movement_query.returning(
+            InventoryMovement.id,
+            InventoryMovement.quantity_before,
+            InventoryMovement.quantity_after
         )
         
-        self.db_session.add(movement)
+        if flush:
+            if self.is_async:
+                result = await self.db_session.execute(movement_query)
+            else:
+                result = self.db_session.execute(movement_query)
+        else:
+            with self.db_session.no_autoflush:
+                if self.is_async:
+                    result = await self.db_session.execute(movement_query)
+                else:
+                    result = self.db_session.execute(movement_query)
+        
+        movement = result.first()
+        if movement is None:
+            raise ValueError(f"Item with ID {item_id} not found")
+        
+        return movement
+    
+    async def _create_movements_bulk(self, rows: List[Tuple]) -> List[Row]:
+        """Apply quantity changes and create their movement records in bulk
+        
+        Each row is (item_id, quantity_change, user_id, notes[, reference]).
+        All quantities are updated by a single UPDATE ... FROM (VALUES ...)
+        and all movements are written by a single INSERT, regardless of the
+        number of rows. Raises ValueError - leaving the caller to roll back -
+        if an item does not exist or would drop below zero. Returns the
+        (id, quantity_before, quantity_after) rows in input order.
+        """
+        # Net change per item; the same item may appear more than once
+        net_changes: Dict[int, int] = {}
+        for row in rows:
+            net_changes[row[0]] = net_changes.get(row[0], 0) + row[1]
+        
+        deltas = values(
+            column('id', Integer),
+            column('delta', Integer),
+            name='deltas'
+        ).data(list(net_changes.items()))
+        
+        quantity_update = update(Item)\
+            .where(Item.id == deltas.c.id, Item.quantity + deltas.c.delta >= 0)\
+            .values(quantity=Item.quantity + deltas.c.delta, updated_at=func.now())\
+            .returning(Item.id, (Item.quantity - deltas.c.delta).label('quantity_before'))\
+            .execution_options(synchronize_session=False)
         
         if self.is_async:
-            await self.db_session.flush()  # Get the ID without committing
+            update_result = await self.db_session.execute(quantity_update)
         else:
-            self.db_session.flush()  # Get the ID without committing
+            update_result = self.db_session.execute(quantity_update)
+        running_quantity = dict(update_result.all())
         
-        return movement
+        missing = [item_id for item_id in net_changes if item_id not in running_quantity]
+        if missing:
+            raise ValueError(f"Items not found or insufficient stock: {missing}")
+        
+        movements = []
+        for row in rows:
+            item_id, quantity_change, user_id, notes = row[:4]
+            quantity_before = running_quantity[item_id]
+            running_quantity[item_id] = quantity_before + quantity_change
+            movements.append({
+                'item_id': item_id,
+                'movement_type': self._movement_type_for(quantity_change),
+                'quantity': quantity_change,
+                'quantity_before': quantity_before,
+                'quantity_after': quantity_before + quantity_change,
+                'user_id': user_id,
+                'notes': notes,
+                'reference_number': row[4] if len(row) > 4 else None
+            })
+        
+        movement_insert = insert(InventoryMovement).returning(
+            InventoryMovement.id,
+            InventoryMovement.quantity_before,
+            InventoryMovement.quantity_after,
+            sort_by_parameter_order=True
+        )
+        
+        if self.is_async:
+            insert_result = await self.db_session.execute(movement_insert, movements)
+        else:
+            insert_result = self.db_session.execute(movement_insert, movements)
+        
+        return insert_result.all()
     
-    async def _check_stock_alerts(self, item: Item):
-        """Check and create stock alerts"""
+    @staticmethod
+    def _movement_type_for(quantity_change: int) -> str:
+        """Movement type implied by the sign of a quantity change"""
+        if quantity_change > 0:
+            return 'INBOUND'
+        elif quantity_change < 0:
+            return 'OUTBOUND'
+        return 'ADJUSTMENT'
+    
+    async def _check_stock_alerts_bulk(self, items: List[Item]):
+        """Check stock alerts for items and insert them in one statement"""
         alerts = []
         
-        if item.quantity == 0:
-            alerts.append({
-                'type': 'out_of_stock',
-                'severity': 'critical',
-                'message': f"Item {item.name} is out of stock",
-                'item_id': item.id
-            })
-        elif item.quantity <= item.reorder_point:
-            alerts.append({
-                'type': 'low_stock',
-                'severity': 'high',
-                'message': f"Item {item.name} is below reorder point",
-                'item_id': item.id
-            })
-        elif item.quantity > item.max_stock:
-            alerts.append({
-                'type': 'overstock',
-                'severity': 'medium',
-                'message': f"Item {item.name} exceeds maximum stock level",
-                'item_id': item.id
-            })
+        for item in items:
+            if item.quantity == 0:
+                alerts.append({
+                    'alert_type': AlertType.OUT_OF_STOCK,
+                    'severity': AlertSeverity.CRITICAL,
+                    'title': 'Out of stock',
+                    'message': f"Item {item.name} is out of stock",
+                    'item_id': item.id,
+                    'is_read': False
+                })
+            elif item.quantity <= item.reorder_point:
+                alerts.append({
+                    'alert_type': AlertType.LOW_STOCK,
+                    'severity': AlertSeverity.HIGH,
+                    'title': 'Low stock',
+                    'message': f"Item {item.name} is below reorder point",
+                    'item_id': item.id,
+                    'is_read': False
+                })
+            elif item.quantity > item.max_stock:
+                alerts.append({
+                    'alert_type': AlertType.OVERSTOCK,
+                    'severity': AlertSeverity.MEDIUM,
+                    'title': 'Overstock',
+                    'message': f"Item {item.name} exceeds maximum stock level",
+                    'item_id': item.id,
+                    'is_read': False
+                })
         
-        # Create alert records
-        for alert_data in alerts:
-            alert = Alert(
-                type=alert_data['type'],
-                severity=alert_data['severity'],
-                message=alert_data['message'],
-                item_id=alert_data['item_id'],
-                is_read=False
-            )
-            self.db_session.add(alert)
+        if not alerts:
+            return
+        
+        # An item that already has an unread alert of the same type keeps it
+        # (alerts_open_uniq) rather than stacking a duplicate. The predicate must
+        # be spelled as in the index for PostgreSQL to infer it.
+        stmt = pg_insert(Alert).on_conflict_do_nothing(
+            index_elements=['item_id', 'alert_type'],
+            index_where=(Alert.is_read == False)
+        )
+        
+        # Executed with the rows as parameters, SQLAlchemy batches them into
+        # multi-row VALUES pages; no_autoflush leaves pending item changes
+        # to the caller's commit instead of flushing them here
+        with self.db_session.no_autoflush:
+            if self.is_async:
+                await self.db_session.execute(stmt, alerts)
+            else:
+                self.db_session.execute(stmt, alerts)
     
     def _get_stock_status(self, item: Item) -> str:
         """Get stock status for an item"""
@@ -829,104 +1251,55 @@ class InventoryService:
         else:
             return 'normal'
     
-    def _apply_filters(self, query, filters: Dict[str, Any]):
-        """Apply filters to query"""
-        if 'category_id' in filters:
-            query = query.filter(Item.category_id == filters['category_id'])
-        
-        if 'supplier_id' in filters:
-            query = query.filter(Item.supplier_id == filters['supplier_id'])
-        
-        if 'location_id' in filters:
-            query = query.filter(Item.location_id == filters['location_id'])
-        
-        if 'stock_status' in filters:
-            status = filters['stock_status']
-            if status == 'low_stock':
-                query = query.filter(Item.quantity <= Item.reorder_point)
-            elif status == 'out_of_stock':
-                query = query.filter(Item.quantity == 0)
-            elif status == 'overstock':
-                query = query.filter(Item.quantity > Item.max_stock)
-            elif status == 'normal':
-                query = query.filter(
-                    and_(
-                        Item.quantity > Item.reorder_point,
-                        Item.quantity <= Item.max_stock
-                    )
-                )
-        
-        if 'search' in filters:
-            search_term = f"%{filters['search']}%"
-            query = query.filter(
-                or_(
-                    Item.name.ilike(search_term),
-                    Item.sku.ilike(search_term),
-                    Item.description.ilike(search_term)
-                )
-            )
-        
-        if 'min_quantity' in filters:
-            query = query.filter(Item.quantity >= filters['min_quantity'])
-        
-        if 'max_quantity' in filters:
-            query = query.filter(Item.quantity <= filters['max_quantity'])
-        
-        if 'min_price' in filters:
-            query = query.filter(Item.price >= filters['min_price'])
-        
-        if 'max_price' in filters:
-            query = query.filter(Item.price <= filters['max_price'])
-        
-        return query
+    @staticmethod
+    def _get_stock_status_row(thresholds: _StockThresholds) -> str:
+        """Get stock status from a thresholds tuple without ORM attribute access"""
+        _, quantity, reorder_point, max_stock = thresholds
+        if quantity == 0:
+            return 'out_of_stock'
+        elif quantity <= reorder_point:
+            return 'low_stock'
+        elif quantity > max_stock:
+            return 'overstock'
+        return 'normal'
     
-    def _apply_filters_async(self, query, filters: Dict[str, Any]):
-        """Apply filters to async query"""
-        if 'category_id' in filters:
-            query = query.where(Item.category_id == filters['category_id'])
-        
-        if 'supplier_id' in filters:
-            query = query.where(Item.supplier_id == filters['supplier_id'])
-        
-        if 'location_id' in filters:
-            query = query.where(Item.location_id == filters['location_id'])
-        
-        if 'stock_status' in filters:
-            status = filters['stock_status']
-            if status == 'low_stock':
-                query = query.where(Item.quantity <= Item.reorder_point)
-            elif status == 'out_of_stock':
-                query = query.where(Item.quantity == 0)
-            elif status == 'overstock':
-                query = query.where(Item.quantity > Item.max_stock)
-            elif status == 'normal':
-                query = query.where(
-                    and_(
-                        Item.quantity > Item.reorder_point,
-                        Item.quantity <= Item.max_stock
-                    )
-                )
-        
-        if 'search' in filters:
-            search_term = f"%{filters['search']}%"
-            query = query.where(
-                or_(
-                    Item.name.ilike(search_term),
-                    Item.sku.ilike(search_term),
-                    Item.description.ilike(search_term)
-                )
-            )
-        
-        if 'min_quantity' in filters:
-            query = query.where(Item.quantity >= filters['min_quantity'])
-        
-        if 'max_quantity' in filters:
-            query = query.where(Item.quantity <= filters['max_quantity'])
+    def _paginate(self, query, pagination: Dict[str, Any]):
+        """Apply keyset pagination when after_id is given, else page/offset
+
+        Fetches page_size + 1 rows; the extra row only signals that another
+        page follows.
+        """
+        page_size = pagination.get('page_size', 50)
+        after_id = pagination.get('after_id')
+        if after_id is not None:
+            return self._apply_keyset(query, after_id, page_size + 1)
         
-        if 'min_price' in filters:
-            query = query.where(Item.price >= filters['min_price'])
+        offset = (pagination.get('page', 1) - 1) * page_size
+        return query.order_by(Item.id).offset(offset).limit(page_size + 1)
+    
+    @staticmethod
+    def _apply_keyset(query, after_id: int, limit: int):
+        """Seek past after_id on the primary key index instead of OFFSET scanning"""
+        return query.where(Item.id > after_id).order_by(Item.id).limit(limit)
+    
+    def _apply_filters(self, query, filters: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+        """Apply filters to a select()
         
-        if 'max_price' in filters:
-            query = query.where(Item.price <= filters['max_price'])
+        Returns the filtered statement and the bind parameters to execute
+        it with.
+        """
+        signature = []
+        params = {}
+        for key, value in sorted(filters.items()):
+            if key in _EQ_FILTERS or key in _RANGE_FILTERS:
+                signature.append((key, None))
+                params[f'filter_{key}'] = value
+            elif key == 'stock_status':
+                if value in _STOCK_STATUS_FILTERS:
+                    signature.append((key, value))
+            elif key == 'search':
+                signature.append((key, None))
+                params['filter_search'] = f"%{value}%"
         
-        return query
\ No newline at end of file
+        criteria = _filter_criteria(tuple(signature))
+        return (query.where(*criteria) if criteria else query), params
@@ -5,16 +5,86 @@ Provides TOTP-based 2FA, backup codes, and QR code generation
 import pyotp
 import qrcode
 import io
+import os
 import base64
+import hmac
 import secrets
 import logging
-from typing import Optional, List, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from ..models import User
+import re
+import time
+from functools import lru_cache
+from urllib.parse import quote
+from typing import Optional, List, Dict, Any, Tuple, Union
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.orm import Session, load_only
+from ..models import User, BackupCode
 from ..database import get_db
 
 logger = logging.getLogger(__name__)
 
+# Key for backup code digests; required, there is no safe default
+_backup_code_pepper = os.getenv("BACKUP_CODE_PEPPER")
+if not _backup_code_pepper:
+    raise RuntimeError("BACKUP_CODE_PEPPER environment variable must be set to hash 2FA backup codes")
+BACKUP_CODE_PEPPER = _backup_code_pepper.encode()
+
+# Shape of generate_backup_codes output; anything else cannot match a stored code
+_BACKUP_CODE_RE = re.compile(r'^[0-9A-Fa-f]{8}$')
+
+@lru_cache(maxsize=4096)
+def _totp_for(secret: str) -> pyotp.TOTP:
+    """Parsed TOTP object for a secret, shared across verifications
+
+    Cleared (see _clear_secret_caches) whenever a secret is replaced or
+    removed so rotated secrets do not linger in the process.
+    """
+    return pyotp.TOTP(secret)
+
+@lru_cache(maxsize=4096)
+def _key_for(secret: str) -> bytes:
+    """Decoded HMAC key of a secret, so verifications skip the base32 decode"""
+    return _totp_for(secret).byte_secret()
+
+@lru_cache(maxsize=256)
+def _render_qr_code(totp_uri: str) -> str:
+    """Base64 PNG of the QR code for a provisioning URI
+
+    Cached so repeated setup/qr-code requests for the same secret reuse the
+    image; cleared together with _totp_for.
+    """
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(totp_uri)
+    qr.make(fit=True)
+    
+    # Create QR code image
+    qr_image = qr.make_image(fill_color="black", back_color="white")
+    
+    # Convert to base64
+    buffer = io.BytesIO()
+    qr_image.save(buffer, format='PNG')
+    # getbuffer() exposes the PNG bytes without the copy getvalue() makes
+    return base64.b64encode(buffer.getbuffer()).decode('ascii')
+
+def _hotp(key: bytes, counter: Union[int, bytes], digits: int = 6) -> str:
+    """RFC 4226 code for a counter (int or packed 8-byte big-endian), using the one-shot OpenSSL HMAC-SHA1"""
+    if isinstance(counter, int):
+        counter = counter.to_bytes(8, 'big')
+    digest = hmac.digest(key, counter, 'sha1')
+    offset = digest[-1] & 0x0F
+    code = (int.from_bytes(digest[offset:offset + 4], 'big') & 0x7FFFFFFF) % 10 ** digits
+    return str(code).zfill(digits)
+
+def _clear_secret_caches():
+    """Drop cached objects derived from TOTP secrets"""
+    _totp_for.cache_clear()
+    _key_for.cache_clear()
+    _render_qr_code.cache_clear()
+
 class TwoFactorService:
     """Two-Factor Authentication service for TOTP-based 2FA"""
     
@@ -22,43 +92,50 @@ class TwoFactorService:
         self.db = db
         self.issuer_name = "Enterprise Inventory System"
         self.backup_codes_count = 8
+        self.totp_valid_window = 1  # time steps accepted either side of now (clock skew)
         
+    def _get_user(self, user_id: int, *columns) -> Optional[User]:
+        """Load a user with only the given columns (plus the primary key)"""
+        return self.db.query(User).options(load_only(*columns)).filter(User.id == user_id).first()
+    
+    def _update_user(self, user_id: int, values: Dict[str, Any], *columns):
+        """Update a user and return the given columns as they were before (not committed)
+
+        One round trip instead of a load followed by a flush; None if the user
+        does not exist.
+        """
+        old = select(User.id, *columns).where(User.id == user_id).with_for_update().subquery()
+        return self.db.execute(
+            update(User)
+            .where(User.id == old.c.id)
+            .values(**values)
+            .returning(old.c.id, *(old.c[column.key] for column in columns))
+            .execution_options(synchronize_session=False)
+        ).first()
+    
     def generate_secret(self) -> str:
         """Generate a new TOTP secret for a user"""
-        try:
-            secret = pyotp.random_base32()
-            logger.info("Generated new TOTP secret")
-            return secret
-        except Exception as e:
-            logger.error(f"Secret generation failed: {str(e)}")
-            raise
+        secret = pyotp.random_base32()
+        logger.info("Generated new TOTP secret")
+        return secret
+    
+    def provisioning_uri(self, user_email: str, secret: str) -> str:
+        """otpauth:// URI for authenticator apps
+
+        Formatted directly, matching pyotp's provisioning_uri for the default
+        SHA1 / 6 digits / 30 s parameters used here, so no TOTP object is built.
+        """
+        issuer = quote(self.issuer_name, safe='')
+        return f"otpauth://totp/{quote(self.issuer_name)}:{quote(user_email)}?secret={secret}&issuer={issuer}"
     
     def generate_qr_code(self, user_email: str, secret: str) -> str:
         """Generate QR code as base64 encoded image for TOTP setup"""
         try:
             # Create TOTP URI
-            totp_uri = pyotp.totp.TOTP(secret).provisioning_uri(
-                name=user_email,
-                issuer_name=self.issuer_name
-            )
+            totp_uri = self.provisioning_uri(user_email, secret)
             
             # Generate QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(totp_uri)
-            qr.make(fit=True)
-            
-            # Create QR code image
-            qr_image = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            qr_image.save(buffer, format='PNG')
-            qr_base64 = base64.b64encode(buffer.getvalue()).decode()
+            qr_base64 = _render_qr_code(totp_uri)
             
             logger.info(f"Generated QR code for user: {user_email}")
             return qr_base64
@@ -69,52 +146,147 @@ class TwoFactorService:
     
     def generate_backup_codes(self) -> List[str]:
         """Generate backup codes for 2FA recovery"""
-        try:
-            backup_codes = []
-            for _ in range(self.backup_codes_count):
-                # Generate 8-character backup code
-                code = secrets.token_hex(4).upper()
-                backup_codes.append(code)
-            
+        # One random read for the whole batch, split into 8-character codes
+        hexed = secrets.token_hex(4 * self.backup_codes_count).upper()
+        backup_codes = [hexed[i:i + 8] for i in range(0, len(hexed), 8)]
+        
+        if logger.isEnabledFor(logging.INFO):
             logger.info(f"Generated {len(backup_codes)} backup codes")
-            return backup_codes
-            
-        except Exception as e:
-            logger.error(f"Backup codes generation failed: {str(e)}")
-            raise
+        return backup_codes
     
     def verify_totp_token(self, secret: str, token: str) -> bool:
         """Verify TOTP token against secret"""
+        if not secret or not token:
+            return False
+        
         try:
-            if not secret or not token:
-                return False
-            
-            totp = pyotp.TOTP(secret)
-            is_valid = totp.verify(token, valid_window=1)  # Allow 30-second window
-            
-            logger.info(f"TOTP verification result: {is_valid}")
-            return is_valid
-            
-        except Exception as e:
+            is_valid = self._match_totp_counter(secret, token) is not None
+        except (ValueError, TypeError) as e:
+            # Malformed base32 secret or a non-ASCII token
             logger.error(f"TOTP verification failed: {str(e)}")
             return False
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"TOTP verification result: {is_valid}")
+        return is_valid
+    
+    def _match_totp_counter(self, secret: str, token: str) -> Optional[int]:
+        """Time step within the valid window whose code matches token, if any"""
+        totp = _totp_for(secret)
+        key = _key_for(secret)
+        token = str(token)
+        digits = totp.digits
+        # Same time step as pyotp's timecode(datetime.now()), without the
+        # datetime round trip through mktime
+        now = int(time.time()) // totp.interval
+        window = self.totp_valid_window
+        for counter in range(now - window, now + window + 1):
+            if hmac.compare_digest(_hotp(key, counter, digits), token):
+                return counter
+        return None
+    
+    def verify_many(self, totp_secrets: List[str], tokens: List[str]) -> List[bool]:
+        """Verify TOTP tokens for many secrets at once (pairwise, no replay tracking)"""
+        if len(totp_secrets) != len(tokens):
+            raise ValueError("secrets and tokens must have the same length")
+        
+        # Every secret uses the default 30-second step, so the counter messages
+        # are packed once for the whole batch
+        now = int(time.time()) // 30
+        messages = [
+            counter.to_bytes(8, 'big')
+            for counter in range(now - self.totp_valid_window, now + self.totp_valid_window + 1)
+        ]
+        results = []
+        for secret, token in zip(totp_secrets, tokens):
+            if not secret or not token:
+                results.append(False)
+                continue
+            totp = _totp_for(secret)
+            key = _key_for(secret)
+            token = str(token)
+            results.append(any(
+                hmac.compare_digest(_hotp(key, message, totp.digits), token) for message in messages
+            ))
+        return results
+    
+    def _accept_totp(self, user: User, token: str, record: bool = True) -> bool:
+        """Verify a TOTP token and record its time step so it cannot be replayed (not committed)
+
+        With record=False the step is only checked against
+        user.two_factor_last_counter, for callers that reset the counter in
+        the same transaction.
+        """
+        if not user.two_factor_secret or not token:
+            return False
+        counter = self._match_totp_counter(user.two_factor_secret, token)
+        if counter is None:
+            return False
+        
+        if record:
+            # Only advance past the last accepted step; a replayed code matches no row
+            accepted = self.db.execute(
+                update(User)
+                .where(
+                    User.id == user.id,
+                    or_(User.two_factor_last_counter.is_(None), User.two_factor_last_counter < counter)
+                )
+                .values(two_factor_last_counter=counter)
+                .returning(User.id)
+                .execution_options(synchronize_session=False)
+            ).first() is not None
+        else:
+            last_counter = user.two_factor_last_counter
+            accepted = last_counter is None or counter > last_counter
+        
+        if not accepted:
+            logger.warning(f"Replayed TOTP token rejected for user {user.id}")
+        return accepted
+    
+    def hash_backup_code(self, user_id: int, backup_code: str) -> str:
+        """HMAC-SHA256 digest of a backup code, salted with the user id"""
+        message = f"{user_id}:{backup_code.upper()}".encode()
+        return hmac.digest(BACKUP_CODE_PEPPER, message, 'sha256').hex()
+    
+    def store_backup_codes(self, user_id: int, backup_codes: List[str]):
+        """Replace a user's backup codes with digests of the given codes (not committed)"""
+        self.db.execute(delete(BackupCode).where(BackupCode.user_id == user_id))
+        self.db.bulk_save_objects([
+            BackupCode(user_id=user_id, code_hash=self.hash_backup_code(user_id, code))
+            for code in backup_codes
+        ])
+    
+    def _consume_backup_code(self, user_id: int, backup_code: str) -> bool:
+        """Mark a matching unused backup code as used (not committed)"""
+        # TOTP tokens and typos skip the lookup; codes are compared as digests
+        # by the unique (user_id, code_hash) index, never as plaintext
+        if not _BACKUP_CODE_RE.match(backup_code):
+            return False
+        # Match and mark the code used in one statement
+        used = self.db.execute(
+            update(BackupCode)
+            .where(
+                BackupCode.user_id == user_id,
+                BackupCode.code_hash == self.hash_backup_code(user_id, backup_code),
+                BackupCode.used_at.is_(None)
+            )
+            .values(used_at=func.now())
+            .returning(BackupCode.id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        return used is not None
+    
+    def _verify_for_user(self, user: User, token: str) -> bool:
+        """Check a TOTP token, then a backup code, against a loaded user (not committed)"""
+        if self._accept_totp(user, token):
+            return True
+        return self._consume_backup_code(user.id, token)
     
     def verify_backup_code(self, user_id: int, backup_code: str) -> bool:
         """Verify and consume backup code"""
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
-            if not user or not user.backup_codes:
-                return False
-            
-            backup_codes = user.backup_codes
-            backup_code_upper = backup_code.upper()
-            
-            if backup_code_upper in backup_codes:
-                # Remove used backup code
-                backup_codes.remove(backup_code_upper)
-                user.backup_codes = backup_codes
+            if self._consume_backup_code(user_id, backup_code):
                 self.db.commit()
-                
                 logger.info(f"Backup code used for user {user_id}")
                 return True
             
@@ -124,30 +296,42 @@ class TwoFactorService:
             logger.error(f"Backup code verification failed: {str(e)}")
             return False
     
-    def setup_2fa_for_user(self, user_id: int) -> Dict[str, Any]:
-        """Initialize 2FA setup for a user"""
+    def setup_2fa_for_user(self, user_id: int, render_qr_code: bool = True) -> Dict[str, Any]:
+        """Initialize 2FA setup for a user
+
+        With render_qr_code=False the QR image is left out (qr_code is None) so
+        the caller can render it later, e.g. in a background task.
+        """
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
-            if not user:
-                raise ValueError("User not found")
-            
             # Generate new secret and backup codes
             secret = self.generate_secret()
             backup_codes = self.generate_backup_codes()
-            qr_code = self.generate_qr_code(user.email, secret)
             
             # Store secret and backup codes (but don't enable 2FA yet)
-            user.two_factor_secret = secret
-            user.backup_codes = backup_codes
-            user.two_factor_setup_complete = False
-            user.two_factor_enabled = False
-            
+            user = self._update_user(
+                user_id,
+                {
+                    "two_factor_secret": secret,
+                    "two_factor_last_counter": None,
+                    "two_factor_setup_complete": False,
+                    "two_factor_enabled": False,
+                },
+                User.email, User.two_factor_secret
+            )
+            if not user:
+                raise ValueError("User not found")
+            self.store_backup_codes(user_id, backup_codes)
             self.db.commit()
+            if user.two_factor_secret:
+                _clear_secret_caches()
+            
+            qr_code = self.generate_qr_code(user.email, secret) if render_qr_code else None
             
             logger.info(f"2FA setup initiated for user {user_id}")
             
             return {
                 "secret": secret,
+                "email": user.email,
                 "qr_code": qr_code,
                 "backup_codes": backup_codes,
                 "manual_entry_key": secret
@@ -160,19 +344,21 @@ class TwoFactorService:
     def enable_2fa_for_user(self, user_id: int, verification_token: str) -> bool:
         """Enable 2FA after user verifies their setup"""
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
-            if not user or not user.two_factor_secret:
-                return False
+            # Flip the flags up front; rolled back unless the token checks out
+            user = self._update_user(
+                user_id,
+                {"two_factor_enabled": True, "two_factor_setup_complete": True},
+                User.two_factor_secret
+            )
             
             # Verify the setup token
-            if self.verify_totp_token(user.two_factor_secret, verification_token):
-                user.two_factor_enabled = True
-                user.two_factor_setup_complete = True
+            if user and self._accept_totp(user, verification_token):
                 self.db.commit()
                 
                 logger.info(f"2FA enabled for user {user_id}")
                 return True
             
+            self.db.rollback()
             return False
             
         except Exception as e:
@@ -182,30 +368,47 @@ class TwoFactorService:
     def disable_2fa_for_user(self, user_id: int, verification_token: str) -> bool:
         """Disable 2FA for a user (requires TOTP or backup code)"""
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
+            # Clear 2FA first and check the token against the previous state;
+            # rolled back unless it is valid
+            user = self._update_user(
+                user_id,
+                {
+                    "two_factor_enabled": False,
+                    "two_factor_setup_complete": False,
+                    "two_factor_secret": None,
+                    "two_factor_last_counter": None,
+                },
+                User.two_factor_secret, User.two_factor_last_counter
+            )
             if not user:
                 return False
             
-            # Verify with TOTP or backup code
-            totp_valid = False
-            backup_valid = False
-            
-            if user.two_factor_secret:
-                totp_valid = self.verify_totp_token(user.two_factor_secret, verification_token)
-            
-            if not totp_valid:
-                backup_valid = self.verify_backup_code(user_id, verification_token)
-            
-            if totp_valid or backup_valid:
-                user.two_factor_enabled = False
-                user.two_factor_setup_complete = False
-                user.two_factor_secret = None
-                user.backup_codes = None
+            # Verify with TOTP (not replayed) or an unused backup code; the
+            # counter was reset above, so check the step without recording it
+            valid = self._accept_totp(user, verification_token, record=False)
+            
+            # The codes go either way; deleting them reports whether one matched
+            deleted = self.db.execute(
+                delete(BackupCode)
+                .where(BackupCode.user_id == user_id)
+                .returning(BackupCode.code_hash, BackupCode.used_at)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if not valid and verification_token:
+                code_hash = self.hash_backup_code(user_id, verification_token)
+                valid = any(
+                    used_at is None and hmac.compare_digest(row_hash, code_hash)
+                    for row_hash, used_at in deleted
+                )
+            
+            if valid:
                 self.db.commit()
+                _clear_secret_caches()
                 
                 logger.info(f"2FA disabled for user {user_id}")
                 return True
             
+            self.db.rollback()
             return False
             
         except Exception as e:
@@ -215,17 +418,16 @@ class TwoFactorService:
     def verify_user_2fa(self, user_id: int, token: str) -> bool:
         """Verify 2FA token for user login"""
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = self._get_user(user_id, User.two_factor_secret, User.two_factor_enabled)
             if not user or not user.two_factor_enabled:
                 return False
             
-            # Try TOTP first
-            if user.two_factor_secret:
-                if self.verify_totp_token(user.two_factor_secret, token):
-                    return True
+            # Try TOTP first, then a backup code
+            if self._verify_for_user(user, token):
+                self.db.commit()
+                return True
             
-            # Try backup code if TOTP fails
-            return self.verify_backup_code(user_id, token)
+            return False
             
         except Exception as e:
             logger.error(f"2FA verification failed for user {user_id}: {str(e)}")
@@ -234,13 +436,14 @@ class TwoFactorService:
     def get_2fa_status(self, user_id: int) -> Dict[str, Any]:
         """Get 2FA status for a user"""
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = self._get_user(user_id, User.two_factor_enabled, User.two_factor_setup_complete, User.two_factor_secret)
             if not user:
                 return {"error": "User not found"}
             
-            remaining_backup_codes = 0
-            if user.backup_codes:
-                remaining_backup_codes = len(user.backup_codes)
+            remaining_backup_codes = self.db.execute(
+                select(func.count(BackupCode.id))
+                .where(BackupCode.user_id == user_id, BackupCode.used_at.is_(None))
+            ).scalar()
             
             return {
                 "enabled": user.two_factor_enabled or False,
@@ -253,10 +456,45 @@ class TwoFactorService:
             logger.error(f"Get 2FA status failed for user {user_id}: {str(e)}")
             return {"error": str(e)}
     
+    def get_2fa_status_bulk(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Get 2FA status for many users in one query, keyed by user id"""
+        try:
+            if not user_ids:
+                return {}
+            
+            remaining_backup_codes = (
+                select(func.count(BackupCode.id))
+                .where(BackupCode.user_id == User.id, BackupCode.used_at.is_(None))
+                .scalar_subquery()
+            )
+            rows = self.db.execute(
+                select(
+                    User.id,
+                    User.two_factor_enabled,
+                    User.two_factor_setup_complete,
+                    User.two_factor_secret.isnot(None),
+                    remaining_backup_codes
+                ).where(User.id.in_(user_ids))
+            ).all()
+            
+            return {
+                user_id: {
+                    "enabled": enabled or False,
+                    "setup_complete": setup_complete or False,
+                    "has_secret": has_secret,
+                    "remaining_backup_codes": remaining
+                }
+                for user_id, enabled, setup_complete, has_secret, remaining in rows
+            }
+            
+        except Exception as e:
+            logger.error(f"Get bulk 2FA status failed: {str(e)}")
+            raise
+    
     def regenerate_backup_codes(self, user_id: int, verification_token: str) -> Optional[List[str]]:
         """Regenerate backup codes for a user"""
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = self._get_user(user_id, User.two_factor_enabled)
             if not user or not user.two_factor_enabled:
                 return None
             
@@ -266,7 +504,7 @@ class TwoFactorService:
             
             # Generate new backup codes
             new_backup_codes = self.generate_backup_codes()
-            user.backup_codes = new_backup_codes
+            self.store_backup_codes(user_id, new_backup_codes)
             self.db.commit()
             
             logger.info(f"Backup codes regenerated for user {user_id}")
@@ -279,7 +517,7 @@ class TwoFactorService:
     def validate_setup_requirements(self, user_id: int) -> Dict[str, Any]:
         """Validate if user can set up 2FA"""
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = self._get_user(user_id, User.is_active, User.is_verified)
             if not user:
                 return {"valid": False, "error": "User not found"}
             
@@ -3,39 +3,45 @@ Comprehensive API endpoint tests for Enterprise Inventory System
 Tests all API endpoints with proper error handling and validation
 """
 
+import asyncio
+import time
 import pytest
 from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
 from unittest.mock import Mock, patch, MagicMock
 import json
 from datetime import datetime
 
-# Import the FastAPI app
+# Import the FastAPI app (src is a package, so import from the repository root)
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src', 'api'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from main import app
+from src.api.main import app
 
-client = TestClient(app)
+@pytest.fixture(scope="session")
+def client():
+    """TestClient shared by the whole test session"""
+    return TestClient(app)
 
 
 class TestHealthAndStatus:
     """Test system health and status endpoints"""
     
-    def test_health_endpoint(self):
+    def test_health_endpoint(self, client):
         """Test health endpoint returns proper status"""
         response = client.get("/health")
         assert response.status_code == 200
         data = response.json()
         assert "status" in data
     
-    def test_metrics_endpoint_exists(self):
+    def test_metrics_endpoint_exists(self, client):
         """Test metrics endpoint exists"""
         response = client.get("/metrics")
         # Should exist or return 404 if not implemented
         assert response.status_code in [200, 404]
     
-    def test_info_endpoint(self):
+    def test_info_endpoint(self, client):
         """Test application info endpoint"""
         response = client.get("/info")
         # Should provide basic app information
@@ -45,18 +51,18 @@ class TestHealthAndStatus:
 class TestInventoryAPI:
     """Test inventory management endpoints"""
     
-    def test_inventory_list_endpoint(self):
+    def test_inventory_list_endpoint(self, client):
         """Test inventory list endpoint structure"""
         response = client.get("/api/v1/inventory")
         # Should return list or require authentication
         assert response.status_code in [200, 401, 403]
     
-    def test_inventory_list_pagination(self):
+    def test_inventory_list_pagination(self, client):
         """Test inventory list with pagination parameters"""
         response = client.get("/api/v1/inventory?page=1&size=10")
         assert response.status_code in [200, 401, 403, 422]
     
-    def test_inventory_create_structure(self):
+    def test_inventory_create_structure(self, client):
         """Test inventory item creation endpoint structure"""
         item_data = {
             "name": "Test Item",
@@ -72,12 +78,12 @@ class TestInventoryAPI:
         # Should accept structure or require auth
         assert response.status_code in [200, 201, 401, 403, 422]
     
-    def test_inventory_get_by_id(self):
+    def test_inventory_get_by_id(self, client):
         """Test get inventory item by ID"""
         response = client.get("/api/v1/inventory/1")
         assert response.status_code in [200, 401, 403, 404]
     
-    def test_inventory_update_structure(self):
+    def test_inventory_update_structure(self, client):
         """Test inventory item update endpoint"""
         update_data = {
             "name": "Updated Item",
@@ -87,7 +93,7 @@ class TestInventoryAPI:
         response = client.put("/api/v1/inventory/1", json=update_data)
         assert response.status_code in [200, 401, 403, 404, 422]
     
-    def test_inventory_delete(self):
+    def test_inventory_delete(self, client):
         """Test inventory item deletion"""
         response = client.delete("/api/v1/inventory/1")
         assert response.status_code in [200, 204, 401, 403, 404]
@@ -96,12 +102,12 @@ class TestInventoryAPI:
 class TestCategoryAPI:
     """Test category management endpoints"""
     
-    def test_categories_list(self):
+    def test_categories_list(self, client):
         """Test categories list endpoint"""
         response = client.get("/api/v1/categories")
         assert response.status_code in [200, 401, 403]
     
-    def test_category_create(self):
+    def test_category_create(self, client):
         """Test category creation"""
         category_data = {
             "name": "Test Category",
@@ -115,12 +121,12 @@ class TestCategoryAPI:
 class TestLocationAPI:
     """Test location management endpoints"""
     
-    def test_locations_list(self):
+    def test_locations_list(self, client):
         """Test locations list endpoint"""
         response = client.get("/api/v1/locations")
         assert response.status_code in [200, 401, 403]
     
-    def test_location_create(self):
+    def test_location_create(self, client):
         """Test location creation"""
         location_data = {
             "name": "Test Warehouse",
@@ -135,7 +141,7 @@ class TestLocationAPI:
 class TestAuthenticationAPI:
     """Test authentication endpoints"""
     
-    def test_login_endpoint_structure(self):
+    def test_login_endpoint_structure(self, client):
         """Test login endpoint accepts correct structure"""
         login_data = {
             "username": "testuser",
@@ -146,19 +152,19 @@ class TestAuthenticationAPI:
         # Should accept structure (may fail auth but not reject format)
         assert response.status_code in [200, 400, 401, 422]
     
-    def test_login_form_data(self):
+    def test_login_form_data(self, client):
         """Test login with form data (OAuth2 style)"""
         response = client.post("/api/v1/auth/login", 
                               data={"username": "test", "password": "test"})
         assert response.status_code in [200, 400, 401, 422]
     
-    def test_token_validation(self):
+    def test_token_validation(self, client):
         """Test token validation endpoint"""
         headers = {"Authorization": "Bearer test-token"}
         response = client.get("/api/v1/auth/me", headers=headers)
         assert response.status_code in [200, 401, 403]
     
-    def test_logout_endpoint(self):
+    def test_logout_endpoint(self, client):
         """Test logout endpoint exists"""
         headers = {"Authorization": "Bearer test-token"}
         response = client.post("/api/v1/auth/logout", headers=headers)
@@ -168,12 +174,12 @@ class TestAuthenticationAPI:
 class TestUserManagementAPI:
     """Test user management endpoints"""
     
-    def test_users_list(self):
+    def test_users_list(self, client):
         """Test users list endpoint (admin only)"""
         response = client.get("/api/v1/users")
         assert response.status_code in [200, 401, 403]
     
-    def test_user_create(self):
+    def test_user_create(self, client):
         """Test user creation endpoint"""
         user_data = {
             "username": "newuser",
@@ -185,7 +191,7 @@ class TestUserManagementAPI:
         response = client.post("/api/v1/users", json=user_data)
         assert response.status_code in [200, 201, 401, 403, 422]
     
-    def test_user_profile(self):
+    def test_user_profile(self, client):
         """Test user profile endpoint"""
         headers = {"Authorization": "Bearer test-token"}
         response = client.get("/api/v1/users/me", headers=headers)
@@ -195,17 +201,17 @@ class TestUserManagementAPI:
 class TestAnalyticsAPI:
     """Test analytics and reporting endpoints"""
     
-    def test_analytics_dashboard(self):
+    def test_analytics_dashboard(self, client):
         """Test analytics dashboard endpoint"""
         response = client.get("/api/v1/analytics/dashboard")
         assert response.status_code in [200, 401, 403]
     
-    def test_inventory_reports(self):
+    def test_inventory_reports(self, client):
         """Test inventory reports endpoint"""
         response = client.get("/api/v1/analytics/inventory-report")
         assert response.status_code in [200, 401, 403]
     
-    def test_analytics_with_filters(self):
+    def test_analytics_with_filters(self, client):
         """Test analytics with date filters"""
         params = {
             "start_date": "2024-01-01",
@@ -218,17 +224,17 @@ class TestAnalyticsAPI:
 class TestETLAPI:
     """Test ETL (Extract, Transform, Load) endpoints"""
     
-    def test_etl_status(self):
+    def test_etl_status(self, client):
         """Test ETL process status endpoint"""
         response = client.get("/api/v1/etl/status")
         assert response.status_code in [200, 401, 403]
     
-    def test_etl_start(self):
+    def test_etl_start(self, client):
         """Test ETL process start endpoint"""
         response = client.post("/api/v1/etl/start")
         assert response.status_code in [200, 201, 401, 403]
     
-    def test_file_upload_structure(self):
+    def test_file_upload_structure(self, client):
         """Test file upload endpoint structure"""
         # Test with empty file to check structure
         files = {"file": ("test.csv", "", "text/csv")}
@@ -239,13 +245,13 @@ class TestETLAPI:
 class TestTwoFactorAPI:
     """Test two-factor authentication endpoints"""
     
-    def test_2fa_setup_endpoint(self):
+    def test_2fa_setup_endpoint(self, client):
         """Test 2FA setup endpoint"""
         headers = {"Authorization": "Bearer test-token"}
         response = client.post("/api/v1/auth/2fa/setup", headers=headers)
         assert response.status_code in [200, 201, 401, 403, 404]
     
-    def test_2fa_verify_endpoint(self):
+    def test_2fa_verify_endpoint(self, client):
         """Test 2FA verification endpoint"""
         verify_data = {"token": "123456"}
         headers = {"Authorization": "Bearer test-token"}
@@ -253,24 +259,96 @@ class TestTwoFactorAPI:
                               json=verify_data, headers=headers)
         assert response.status_code in [200, 400, 401, 403, 422]
     
-    def test_2fa_disable_endpoint(self):
+    def test_2fa_disable_endpoint(self, client):
         """Test 2FA disable endpoint"""
         headers = {"Authorization": "Bearer test-token"}
         response = client.post("/api/v1/auth/2fa/disable", headers=headers)
         assert response.status_code in [200, 401, 403, 404]
 
 
+class TestTwoFactorBulkStatusAPI:
+    """Test the admin bulk 2FA status endpoint"""
+    
+    STATUS = {
+        "enabled": True,
+        "setup_complete": True,
+        "has_secret": True,
+        "remaining_backup_codes": 8
+    }
+    
+    @pytest.fixture
+    def as_user(self):
+        """Authenticate requests as a user with the given role"""
+        from src.api.routes.two_factor import get_current_user
+        from src.database import get_sync_db
+        from src.models import UserRole
+        
+        def _as_user(role=UserRole.ADMIN):
+            app.dependency_overrides[get_current_user] = lambda: Mock(id=1, role=role)
+            app.dependency_overrides[get_sync_db] = lambda: MagicMock()
+        
+        yield _as_user
+        app.dependency_overrides.clear()
+    
+    def test_bulk_status_requires_auth(self, client):
+        """Test bulk status rejects unauthenticated requests"""
+        response = client.get("/api/2fa/status/bulk?user_ids=1")
+        assert response.status_code in [401, 403]
+    
+    def test_bulk_status_admin_only(self, client, as_user):
+        """Test non-admin users are refused before any lookup"""
+        from src.models import UserRole
+        as_user(UserRole.MANAGER)
+        
+        with patch("src.api.routes.two_factor.TwoFactorService") as service:
+            response = client.get("/api/2fa/status/bulk?user_ids=1&user_ids=2")
+        
+        assert response.status_code == 403
+        service.assert_not_called()
+    
+    def test_bulk_status_response_shape(self, client, as_user):
+        """Test statuses are keyed by user id"""
+        as_user()
+        
+        with patch("src.api.routes.two_factor.TwoFactorService") as service:
+            service.return_value.get_2fa_status_bulk.return_value = {
+                1: self.STATUS,
+                2: {**self.STATUS, "enabled": False, "remaining_backup_codes": 0}
+            }
+            response = client.get("/api/2fa/status/bulk?user_ids=1&user_ids=2&user_ids=3")
+        
+        assert response.status_code == 200
+        service.return_value.get_2fa_status_bulk.assert_called_once_with([1, 2, 3])
+        assert response.json() == {
+            "1": self.STATUS,
+            "2": {**self.STATUS, "enabled": False, "remaining_backup_codes": 0}
+        }
+    
+    def test_bulk_status_max_items(self, client, as_user):
+        """Test at most 500 user ids are accepted"""
+        as_user()
+        
+        with patch("src.api.routes.two_factor.TwoFactorService") as service:
+            service.return_value.get_2fa_status_bulk.return_value = {}
+            at_limit = client.get("/api/2fa/status/bulk", params={"user_ids": list(range(1, 501))})
+            over_limit = client.get("/api/2fa/status/bulk", params={"user_ids": list(range(1, 502))})
+        
+        assert at_limit.status_code == 200
+        assert over_limit.status_code == 422
+        service.return_value.get_2fa_status_bulk.assert_called_once()
+
+
 class TestInputValidation:
     """Test input validation and security"""
     
-    def test_sql_injection_prevention(self):
+    def test_sql_injection_prevention(self, client):
         """Test SQL injection prevention in search"""
         malicious_input = "'; DROP TABLE inventory; --"
         response = client.get(f"/api/v1/inventory?search={malicious_input}")
         # Should not return 500 error (should handle gracefully)
         assert response.status_code in [200, 400, 401, 403, 422]
     
-    def test_xss_prevention(self):
+    def test_xss_prevention(self, client):
         """Test XSS prevention in item creation"""
         xss_data = {
             "name": "<script>alert('xss')</script>",
@@ -281,7 +359,7 @@ class TestInputValidation:
         response = client.post("/api/v1/inventory", json=xss_data)
         assert response.status_code in [200, 201, 400, 401, 403, 422]
     
-    def test_oversized_payload(self):
+    def test_oversized_payload(self, client):
         """Test handling of oversized payloads"""
         large_description = "A" * 10000  # 10KB description
         large_item = {
@@ -297,7 +375,7 @@ class TestInputValidation:
 class TestAPIDocumentation:
     """Test API documentation endpoints"""
     
-    def test_openapi_schema(self):
+    def test_openapi_schema(self, client):
         """Test OpenAPI schema is available and valid"""
         response = client.get("/openapi.json")
         assert response.status_code == 200
@@ -307,12 +385,12 @@ class TestAPIDocumentation:
         assert "info" in schema
         assert "paths" in schema
     
-    def test_swagger_docs(self):
+    def test_swagger_docs(self, client):
         """Test Swagger UI is available"""
         response = client.get("/docs")
         assert response.status_code == 200
     
-    def test_redoc_docs(self):
+    def test_redoc_docs(self, client):
         """Test ReDoc is available"""
         response = client.get("/redoc")
         assert response.status_code == 200
@@ -321,24 +399,24 @@ class TestAPIDocumentation:
 class TestErrorHandling:
     """Test error handling and edge cases"""
     
-    def test_404_handling(self):
+    def test_404_handling(self, client):
         """Test 404 error handling"""
         response = client.get("/api/v1/nonexistent")
         assert response.status_code == 404
     
-    def test_405_method_not_allowed(self):
+    def test_405_method_not_allowed(self, client):
         """Test method not allowed handling"""
         response = client.patch("/health")  # PATCH on GET endpoint
         assert response.status_code == 405
     
-    def test_malformed_json(self):
+    def test_malformed_json(self, client):
         """Test malformed JSON handling"""
         response = client.post("/api/v1/inventory",
                               data="{invalid: json}",
                               headers={"content-type": "application/json"})
         assert response.status_code == 422
     
-    def test_missing_required_fields(self):
+    def test_missing_required_fields(self, client):
         """Test missing required fields handling"""
         incomplete_item = {"name": "Test Item"}  # Missing required fields
         response = client.post("/api/v1/inventory", json=incomplete_item)
@@ -348,48 +426,37 @@ class TestErrorHandling:
 class TestPerformanceBaseline:
     """Test performance characteristics and baselines"""
     
-    def test_health_endpoint_performance(self):
+    def test_health_endpoint_performance(self, client):
         """Test health endpoint response time"""
-        import time
-        
-        start_time = time.time()
+        start_time = time.perf_counter()
         response = client.get("/health")
-        end_time = time.time()
+        end_time = time.perf_counter()
         
         response_time = (end_time - start_time) * 1000
         assert response_time < 1000  # Should respond within 1 second
         print(f"Health endpoint response time: {response_time:.2f}ms")
     
-    def test_concurrent_requests_handling(self):
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_handling(self):
         """Test handling of multiple concurrent requests"""
-        import threading
-        import time
-        
-        results = []
-        
-        def make_request():
-            start_time = time.time()
-            response = client.get("/health")
-            end_time = time.time()
-            results.append({
+        # Requests run concurrently on the event loop instead of in threads
+        # around the sync TestClient portal
+        async def make_request(ac):
+            start_time = time.perf_counter()
+            response = await ac.get("/health")
+            return {
                 "status_code": response.status_code,
-                "response_time": (end_time - start_time) * 1000
-            })
-        
-        # Create 5 concurrent threads
-        threads = [threading.Thread(target=make_request) for _ in range(5)]
-        
-        start_time = time.time()
-        for thread in threads:
-            thread.start()
-        
-        for thread in threads:
-            thread.join()
+                "response_time": (time.perf_counter() - start_time) * 1000
+            }
         
-        total_time = (time.time() - start_time) * 1000
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            start_time = time.perf_counter()
+            results = await asyncio.gather(*(make_request(ac) for _ in range(50)))
+            total_time = (time.perf_counter() - start_time) * 1000
         
         # All requests should complete successfully
-        assert len(results) == 5
+        assert len(results) == 50
         assert all(result["status_code"] == 200 for result in results)
         assert total_time < 5000  # All requests within 5 seconds
         
@@ -0,0 +1,206 @@
+"""
+Inventory service tests for Enterprise Inventory System
+Covers keyset pagination of the item list and bulk stock movements
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import select, text
+
+from src.models import Category, InventoryMovement, Item, Location, MovementType, User
+from src.services.inventory_service import InventoryService
+
+
+@pytest.fixture
+def items(db_session):
+    """Seven items; odd ids in category 1, even ids in category 2"""
+    db_session.add_all([Category(id=1, name="Tools"), Category(id=2, name="Parts")])
+    db_session.add_all([Location(id=1, name="Main", code="MAIN")])
+    db_session.add(User(id=1, email="stock@example.com", password_hash="x", name="Stock Clerk"))
+    db_session.flush()
+    db_session.add_all([
+        Item(id=i, name=f"Item {i}", sku=f"SKU-{i}", category_id=1 if i % 2 else 2,
+             location_id=1, quantity=i * 10, reorder_point=10, max_stock=100, price=2, cost=1)
+        for i in range(1, 8)
+    ])
+    db_session.commit()
+    return db_session
+
+
+async def _page(session, filters=None, **pagination):
+    result = await InventoryService(session).get_items(filters, pagination)
+    return [item['id'] for item in result['items']], result['next_after_id']
+
+
+@pytest.mark.requires_db
+class TestKeysetPagination:
+    """after_id continues the list on the primary key"""
+
+    @pytest.mark.asyncio
+    async def test_after_id_continues_from_previous_page(self, items):
+        assert await _page(items, page_size=3) == ([1, 2, 3], 3)
+        assert await _page(items, page_size=3, after_id=3) == ([4, 5, 6], 6)
+
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_next_after_id(self, items):
+        assert await _page(items, page_size=3, after_id=6) == ([7], None)
+
+    @pytest.mark.asyncio
+    async def test_full_last_page_has_no_next_after_id(self, items):
+        assert await _page(items, page_size=3, after_id=4) == ([5, 6, 7], None)
+        assert await _page(items, page_size=7) == ([1, 2, 3, 4, 5, 6, 7], None)
+
+    @pytest.mark.asyncio
+    async def test_after_past_the_end_is_empty(self, items):
+        assert await _page(items, page_size=3, after_id=7) == ([], None)
+
+    @pytest.mark.asyncio
+    async def test_filters_combine_with_after_id(self, items):
+        filters = {'category_id': 1}
+        assert await _page(items, filters, page_size=2) == ([1, 3], 3)
+        assert await _page(items, filters, page_size=2, after_id=3) == ([5, 7], None)
+        assert await _page(items, {'category_id': 2}, page_size=2, after_id=2) == ([4, 6], None)
+
+    @pytest.mark.asyncio
+    async def test_offset_pages_report_next_after_id(self, items):
+        assert await _page(items, page=2, page_size=3) == ([4, 5, 6], 6)
+        assert await _page(items, page=3, page_size=3) == ([7], None)
+
+
+def _quantities(session):
+    session.expire_all()
+    return dict(session.execute(select(Item.id, Item.quantity).order_by(Item.id)).all())
+
+
+def _movements(session):
+    return session.execute(
+        select(InventoryMovement.item_id, InventoryMovement.movement_type, InventoryMovement.quantity,
+               InventoryMovement.quantity_before, InventoryMovement.quantity_after)
+        .order_by(InventoryMovement.id)
+    ).all()
+
+
+@pytest.mark.requires_db
+class TestBulkMovements:
+    """_create_movements_bulk applies every row in one UPDATE and one INSERT"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_item_tracks_running_quantity(self, items):
+        service = InventoryService(items)
+        movements = await service._create_movements_bulk([
+            (1, 5, 1, None), (2, -20, 1, None), (1, -12, 1, None, "REF-1")
+        ])
+        items.commit()
+
+        assert [(m.quantity_before, m.quantity_after) for m in movements] == [(10, 15), (20, 0), (15, 3)]
+        assert _quantities(items)[1] == 3
+        assert _quantities(items)[2] == 0
+        assert _movements(items) == [
+            (1, MovementType.INBOUND, 5, 10, 15),
+            (2, MovementType.OUTBOUND, -20, 20, 0),
+            (1, MovementType.OUTBOUND, -12, 15, 3),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_negative_result_is_rejected(self, items):
+        service = InventoryService(items)
+        with pytest.raises(ValueError, match="insufficient stock"):
+            await service._create_movements_bulk([(1, -11, 1, None)])
+        items.rollback()
+
+        assert _quantities(items)[1] == 10
+        assert _movements(items) == []
+
+
+@pytest.mark.requires_db
+class TestTransferStock:
+    """Both legs of a transfer are applied together or not at all"""
+
+    @pytest.mark.asyncio
+    async def test_transfer_moves_quantity(self, items):
+        result = await InventoryService(items).transfer_stock(3, 4, 25, user_id=1)
+
+        assert result['quantity'] == 25
+        quantities = _quantities(items)
+        assert (quantities[3], quantities[4]) == (5, 65)
+        assert _movements(items) == [
+            (3, MovementType.OUTBOUND, -25, 30, 5),
+            (4, MovementType.INBOUND, 25, 40, 65),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_insufficient_stock_is_rejected(self, items):
+        with pytest.raises(ValueError, match="insufficient stock"):
+            await InventoryService(items).transfer_stock(1, 2, 11, user_id=1)
+
+        quantities = _quantities(items)
+        assert (quantities[1], quantities[2]) == (10, 20)
+        assert _movements(items) == []
+
+    @pytest.mark.asyncio
+    async def test_failed_leg_rolls_back_the_other(self, items):
+        """The source is decremented before the missing target is detected"""
+        with pytest.raises(ValueError, match=r"\[99\]"):
+            await InventoryService(items).transfer_stock(1, 99, 5, user_id=1)
+
+        assert _quantities(items)[1] == 10
+        assert _movements(items) == []
+
+    @pytest.mark.asyncio
+    async def test_non_positive_quantity_is_rejected(self, items):
+        with pytest.raises(ValueError, match="positive"):
+            await InventoryService(items).transfer_stock(1, 2, 0, user_id=1)
+
+
+@pytest.mark.requires_db
+class TestApplyCounts:
+    """apply_counts sets counted quantities and records the variances"""
+
+    @pytest.mark.asyncio
+    async def test_counts_update_changed_items_only(self, items):
+        result = await InventoryService(items).apply_counts("CNT-1", {1: 12, 2: 20, 3: 0, 99: 5}, user_id=1)
+
+        assert result['items_counted'] == 4
+        assert result['items_adjusted'] == 2
+        assert sorted((a['item_id'], a['system_quantity'], a['counted_quantity'], a['variance'])
+                      for a in result['adjustments']) == [(1, 10, 12, 2), (3, 30, 0, -30)]
+        quantities = _quantities(items)
+        assert (quantities[1], quantities[2], quantities[3]) == (12, 20, 0)
+        assert sorted(_movements(items)) == [
+            (1, MovementType.ADJUSTMENT, 2, 10, 12),
+            (3, MovementType.ADJUSTMENT, -30, 30, 0),
+        ]
+        assert set(items.scalars(select(InventoryMovement.reference_number))) == {"CNT-1"}
+
+    def test_adjustment_committed_mid_count_sets_quantity_before(self, items):
+        """A count blocked on an item's lock takes its variance from the committed quantity"""
+        blocked = threading.Event()
+        with items.get_bind().connect() as other:
+            other.execute(text("UPDATE items SET quantity = 15 WHERE id = 1"))
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                def run_count():
+                    blocked.set()
+                    return asyncio.run(InventoryService(items).apply_counts("CNT-3", {1: 12}, user_id=1))
+                future = pool.submit(run_count)
+                blocked.wait()
+                with pytest.raises(TimeoutError):
+                    future.result(timeout=0.5)
+                other.commit()
+                result = future.result(timeout=10)
+
+        assert [(a['system_quantity'], a['counted_quantity'], a['variance'])
+                for a in result['adjustments']] == [(15, 12, -3)]
+        assert _quantities(items)[1] == 12
+        assert _movements(items) == [(1, MovementType.ADJUSTMENT, -3, 15, 12)]
+
+    @pytest.mark.asyncio
+    async def test_negative_count_is_rejected(self, items):
+        with pytest.raises(ValueError, match="cannot be negative"):
+            await InventoryService(items).apply_counts("CNT-2", {1: 4, 2: -1}, user_id=1)
+
+        quantities = _quantities(items)
+        assert (quantities[1], quantities[2]) == (10, 20)
+        assert _movements(items) == []
@@ -0,0 +1,154 @@
+"""
+Rules engine tests for Enterprise Inventory System
+Checks that vectorized rule conditions agree with their row conditions
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+# Import the rules engine (src is a package, so import from the repository root)
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.rules_engine import RuleType, RulePriority, RulesEngine
+
+
+RECORDS = [
+    {"id": 1, "name": "Widget", "quantity": 5, "reorder_point": 10, "max_stock": 100, "category_id": 1},
+    {"id": 2, "name": "Bolt", "quantity": None, "reorder_point": 10, "max_stock": 100, "category_id": 2},
+    {"id": 3, "name": "Nut", "quantity": 500, "reorder_point": 10, "max_stock": None, "category_id": None},
+    {"id": 4, "name": "Gear", "quantity": 50, "reorder_point": None, "max_stock": 40, "category_id": 0},
+    {"id": 5, "name": "Cog", "quantity": np.nan, "reorder_point": 10, "max_stock": np.nan, "category_id": np.nan},
+]
+
+
+@pytest.fixture
+def engine():
+    return RulesEngine()
+
+
+def _rule(engine, rule_id):
+    return engine.rules_registry[rule_id]
+
+
+class TestVectorizedConditions:
+    """Vectorized masks give the same answer as the row conditions"""
+
+    @pytest.mark.parametrize("rule_id", ["low_stock_alert", "overstocking_alert", "auto_categorization"])
+    def test_mask_matches_row_condition(self, engine, rule_id):
+        """Mask over a frame with NaN values matches the condition on its rows"""
+        rule = _rule(engine, rule_id)
+        data = pd.DataFrame.from_records(RECORDS)
+
+        mask = engine._rule_mask(rule, data)
+        expected = [bool(rule["condition"](row)) for row in data.to_dict("records")]
+
+        assert mask.tolist() == expected
+
+    @pytest.mark.parametrize("rule_id", ["low_stock_alert", "overstocking_alert"])
+    def test_nan_operands_do_not_match(self, engine, rule_id):
+        """A NaN quantity or threshold never raises a stock alert"""
+        data = pd.DataFrame.from_records(RECORDS)
+        mask = engine._rule_mask(_rule(engine, rule_id), data)
+
+        assert not mask[data["id"].isin([2, 5])].any()
+
+    def test_missing_columns_use_defaults(self, engine):
+        """Absent columns behave like dict.get defaults in the row conditions"""
+        data = pd.DataFrame({"id": [1, 2], "quantity": [5, 2000]})
+
+        for rule_id in ["low_stock_alert", "overstocking_alert", "auto_categorization"]:
+            rule = _rule(engine, rule_id)
+            mask = engine._rule_mask(rule, data)
+            expected = [bool(rule["condition"](row)) for row in data.to_dict("records")]
+            assert mask.tolist() == expected, rule_id
+
+
+class TestAlertPathParity:
+    """process_alerts_frame raises the same alerts as process_alerts"""
+
+    @staticmethod
+    def _keys(alerts):
+        return sorted((alert["rule_id"], alert["type"], alert["item_id"]) for alert in alerts)
+
+    @pytest.mark.asyncio
+    async def test_frame_and_row_paths_agree(self, engine):
+        """Same alerts from a frame with NaN/None values and from its records"""
+        data = pd.DataFrame.from_records(RECORDS)
+
+        frame_alerts = await engine.process_alerts_frame(data)
+        row_alerts = await engine.process_alerts_list(RECORDS)
+        frame_row_alerts = await engine.process_alerts_list(data.to_dict("records"))
+
+        frame_keys = self._keys(frame_alerts.to_dict("records"))
+        assert frame_keys == self._keys(row_alerts)
+        assert frame_keys == self._keys(frame_row_alerts)
+        assert frame_keys == [
+            ("low_stock_alert", "low_stock", 1),
+            ("overstocking_alert", "overstocking", 4),
+        ]
+
+
+class TestRuleIndex:
+    """Mutators keep the type buckets and counts equal to a full rebuild"""
+
+    @staticmethod
+    def _state(engine):
+        return (
+            {t: [rule_id for rule_id, _ in rules] for t, rules in engine._by_type.items()},
+            {t: [rule_id for rule_id, _ in rules] for t, rules in engine._active_by_type.items()},
+            dict(engine._type_counts),
+            dict(engine._priority_counts),
+            engine._active_count,
+        )
+
+    @staticmethod
+    def _register(engine, rule_id, rule_type=RuleType.TRANSFORMATION, priority=RulePriority.LOW):
+        engine.register_rule(rule_id, rule_type, priority, lambda row: False, lambda row: {})
+
+    def test_mutations_match_full_rebuild(self, engine):
+        """Register, replace, (de)activate and remove without a rebuild"""
+        with patch.object(engine, "_index_rules", side_effect=AssertionError("full rebuild")):
+            for i in range(5):
+                self._register(engine, f"t{i}")
+            self._register(engine, "a0", RuleType.ALERT, RulePriority.CRITICAL)
+            engine.deactivate_rule("t1")
+            engine.deactivate_rule("t1")
+            engine.deactivate_rule("t3")
+            engine.activate_rule("t1")
+            engine.activate_rule("t1")
+            engine.remove_rule("t3")
+            engine.remove_rule("a0")
+            engine.remove_rule("missing")
+            self._register(engine, "t0", RuleType.VALIDATION, RulePriority.HIGH)
+
+        incremental = self._state(engine)
+        engine._index_rules()
+        assert incremental == self._state(engine)
+
+    def test_reactivated_rule_keeps_registration_order(self, engine):
+        """Transformation rules run in registration order after reactivation"""
+        for i in range(3):
+            self._register(engine, f"t{i}")
+        engine.deactivate_rule("t0")
+        engine.activate_rule("t0")
+
+        active = [rule_id for rule_id, _ in engine._active_by_type[RuleType.TRANSFORMATION]]
+        assert active[-3:] == ["t0", "t1", "t2"]
+
+    @pytest.mark.asyncio
+    async def test_summary_counts(self, engine):
+        """get_rules_summary reports the maintained counts"""
+        before = await engine.get_rules_summary()
+        self._register(engine, "t0", priority=RulePriority.HIGH)
+        engine.deactivate_rule("t0")
+
+        summary = await engine.get_rules_summary()
+        assert summary["total_rules"] == before["total_rules"] + 1
+        assert summary["active_rules"] == before["active_rules"]
+        assert summary["inactive_rules"] == before["inactive_rules"] + 1
+        assert sum(summary["rules_by_type"].values()) == summary["total_rules"]
+        assert sum(summary["rules_by_priority"].values()) == summary["total_rules"]
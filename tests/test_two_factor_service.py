@@ -0,0 +1,139 @@
+"""
+Two-factor authentication service tests for Enterprise Inventory System
+Covers backup code hashing and single-use consumption
+"""
+
+import hashlib
+import hmac
+import time
+
+import pyotp
+import pytest
+
+from src.models import User
+from src.services.two_factor_service import BACKUP_CODE_PEPPER, TwoFactorService
+
+
+@pytest.fixture
+def user(db_session):
+    user = User(email="2fa@example.com", password_hash="x", name="Two Factor")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+class TestBackupCodeHashing:
+    """Backup codes are stored as peppered, per-user digests"""
+
+    def test_hash_is_peppered_hmac(self):
+        digest = TwoFactorService(None).hash_backup_code(7, "abcd1234")
+        expected = hmac.new(BACKUP_CODE_PEPPER, b"7:ABCD1234", hashlib.sha256).hexdigest()
+        assert digest == expected
+        assert len(digest) == 64
+
+    def test_hash_ignores_case_and_is_salted_by_user(self):
+        service = TwoFactorService(None)
+        assert service.hash_backup_code(1, "abcd1234") == service.hash_backup_code(1, "ABCD1234")
+        assert service.hash_backup_code(1, "ABCD1234") != service.hash_backup_code(2, "ABCD1234")
+
+
+@pytest.mark.requires_db
+class TestBackupCodeConsumption:
+    """Backup codes verify once and only once"""
+
+    def test_code_is_consumed_once(self, db_session, user):
+        service = TwoFactorService(db_session)
+        codes = service.setup_2fa_for_user(user.id)["backup_codes"]
+
+        assert service.verify_backup_code(user.id, codes[0]) is True
+        assert service.verify_backup_code(user.id, codes[0]) is False
+        assert service.get_2fa_status(user.id)["remaining_backup_codes"] == len(codes) - 1
+
+    def test_code_is_case_insensitive(self, db_session, user):
+        service = TwoFactorService(db_session)
+        codes = service.setup_2fa_for_user(user.id)["backup_codes"]
+
+        assert service.verify_backup_code(user.id, codes[1].lower()) is True
+
+    def test_wrong_code_is_rejected(self, db_session, user):
+        service = TwoFactorService(db_session)
+        codes = service.setup_2fa_for_user(user.id)["backup_codes"]
+        wrong = next(code for code in ("00000000", "FFFFFFFF") if code not in codes)
+
+        assert service.verify_backup_code(user.id, wrong) is False
+        assert service.get_2fa_status(user.id)["remaining_backup_codes"] == len(codes)
+
+    def test_codes_are_not_shared_between_users(self, db_session, user):
+        other = User(email="other@example.com", password_hash="x", name="Other")
+        db_session.add(other)
+        db_session.commit()
+        service = TwoFactorService(db_session)
+        codes = service.setup_2fa_for_user(user.id)["backup_codes"]
+
+        assert service.verify_backup_code(other.id, codes[0]) is False
+
+
+def _fresh_step(interval=30, margin=3):
+    """Wait for a new time step if the current one ends within margin seconds"""
+    remaining = interval - time.time() % interval
+    if remaining < margin:
+        time.sleep(remaining)
+
+
+def _code_at(secret, steps_from_now):
+    """TOTP code for the time step steps_from_now away from the current one"""
+    totp = pyotp.TOTP(secret)
+    return totp.at(time.time() + steps_from_now * totp.interval)
+
+
+@pytest.mark.requires_db
+class TestTwoFactorState:
+    """Verification always reflects the stored 2FA state"""
+
+    def test_reenabled_user_verifies(self, db_session, user):
+        _fresh_step()
+        service = TwoFactorService(db_session)
+        codes = service.setup_2fa_for_user(user.id)["backup_codes"]
+        secret = db_session.get(User, user.id).two_factor_secret
+        assert service.enable_2fa_for_user(user.id, _code_at(secret, -1))
+        assert service.disable_2fa_for_user(user.id, codes[0])
+        assert service.verify_user_2fa(user.id, codes[1]) is False
+
+        service.setup_2fa_for_user(user.id)
+        db_session.expire_all()
+        secret = db_session.get(User, user.id).two_factor_secret
+        assert service.enable_2fa_for_user(user.id, _code_at(secret, -1))
+        assert service.verify_user_2fa(user.id, _code_at(secret, 0)) is True
+
+
+@pytest.mark.requires_db
+class TestTotpReplay:
+    """A TOTP code is accepted once per time step"""
+
+    @pytest.fixture
+    def secret(self, db_session, user):
+        _fresh_step()
+        service = TwoFactorService(db_session)
+        service.setup_2fa_for_user(user.id)
+        secret = db_session.get(User, user.id).two_factor_secret
+        assert service.enable_2fa_for_user(user.id, _code_at(secret, -1))
+        return secret
+
+    def test_reused_code_is_rejected(self, db_session, user, secret):
+        service = TwoFactorService(db_session)
+        code = _code_at(secret, 0)
+
+        assert service.verify_user_2fa(user.id, code) is True
+        assert service.verify_user_2fa(user.id, code) is False
+
+    def test_enable_code_cannot_be_replayed(self, db_session, user, secret):
+        service = TwoFactorService(db_session)
+
+        assert service.verify_user_2fa(user.id, _code_at(secret, -1)) is False
+
+    def test_disable_rejects_replayed_code(self, db_session, user, secret):
+        service = TwoFactorService(db_session)
+
+        assert service.disable_2fa_for_user(user.id, _code_at(secret, -1)) is False
+        assert service.get_2fa_status(user.id)["enabled"] is True
+        assert service.disable_2fa_for_user(user.id, _code_at(secret, 0)) is True